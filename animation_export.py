@@ -0,0 +1,100 @@
+"""
+Export animations as recordings which may be played back or rendered by
+third-party tools.
+
+Both exporters consume an iterator of frames (as produced by
+:py:func:`streaming_wavelet_toy.generate_animation`) in a single pass, writing
+each frame out as soon as it is rendered.
+
+* :py:func:`write_terminalizer` produces a YAML file for the `terminalizer
+  <https://terminalizer.com/>`_ GIF generator.
+* :py:func:`write_asciicast` produces an `asciicast v2
+  <https://docs.asciinema.org/manual/asciicast/v2/>`_ recording, optionally
+  using delta-encoded frames (see :py:mod:`terminal_delta`).
+"""
+
+from typing import Iterable, Iterator, TextIO, Tuple
+
+from itertools import chain
+
+from textwrap import dedent
+
+import json
+
+from terminal_delta import CLEAR_SCREEN, DeltaEncoder
+
+
+def frame_dimensions(frame: str) -> Tuple[int, int]:
+    """
+    Return the (columns, rows) required to display a frame. (All frames of an
+    animation have the same dimensions.)
+    """
+    lines = frame.splitlines()
+    return (max((len(line) for line in lines), default=0), len(lines) + 1)
+
+
+def _peek_dimensions(frames: Iterable[str]) -> Tuple[Iterator[str], int, int]:
+    """
+    Determine the dimensions of an animation from its first frame, returning
+    an iterator over all of the frames and the columns and rows.
+    """
+    frames = iter(frames)
+    first_frame = next(frames, "")
+    num_cols, num_rows = frame_dimensions(first_frame)
+    return (chain([first_frame], frames), num_cols, num_rows)
+
+
+def write_terminalizer(frames: Iterable[str], out: TextIO, delay: float) -> None:
+    """
+    Write an animation as a terminalizer YAML file.
+    """
+    frames, num_cols, num_rows = _peek_dimensions(frames)
+
+    out.write(
+        dedent(
+            f"""
+            config:
+              cols: {num_cols}
+              rows: {num_rows}
+              repeat: 0
+              quality: 100
+              frameDelay: auto
+              maxIdleTime: 2000
+              frameBox:
+                type: null
+                title: null
+                style: []
+              watermark:
+                imagePath: null
+              fontFamily: "Monaco, Lucida Console, Ubuntu Mono, Monospace"
+              fontSize: 12
+              theme:
+                background: "#000000"
+            """
+        ).strip()
+    )
+    out.write("\nrecords:\n")
+    for i, frame in enumerate(frames):
+        frame = (CLEAR_SCREEN + frame).replace("\n", "\r\n")
+        out.write(f" - delay: {int((delay if i != 0 else 0)*1000)}\n")
+        out.write(f"   content: {json.dumps(frame)}\n")
+
+
+def write_asciicast(
+    frames: Iterable[str], out: TextIO, delay: float, delta: bool = True
+) -> None:
+    """
+    Write an animation as an asciicast v2 recording. If 'delta' is True, each
+    frame only redraws the characters which changed.
+    """
+    frames, num_cols, num_rows = _peek_dimensions(frames)
+
+    out.write(json.dumps({"version": 2, "width": num_cols, "height": num_rows}))
+    out.write("\n")
+
+    encoder = DeltaEncoder()
+    for i, frame in enumerate(frames):
+        data = encoder.encode(frame) if delta else CLEAR_SCREEN + frame
+        data = data.replace("\n", "\r\n")
+        out.write(json.dumps([round(i * delay, 6), "o", data]))
+        out.write("\n")
@@ -0,0 +1,338 @@
+"""
+An index over a logged trace which allows animation frames to be produced
+efficiently, one after another.
+
+Rather than scanning the whole access log for every frame, the
+:py:class:`AnimationTimeline` is built once from the log. It records the calls
+made for each array (in order) and the times at which each array cell changes
+appearance. Advancing from one frame to the next then only requires applying
+the changes which occurred in between.
+
+To allow playback to start part way through a long trace, snapshots
+('keyframes') of the state of every array are taken every
+:py:data:`KEYFRAME_INTERVAL` changes while the timeline is built. Seeking
+restores the latest keyframe before the target time and replays (fewer than a
+keyframe interval's worth of) the changes which followed it. To save memory,
+each keyframe only stores the blocks of cells which changed since the
+previous keyframe, sharing the rest with it.
+
+For paged lists (see :py:class:`~logging_lazy_lists.LoggingLazyList`), each
+displayed cell represents a whole page and shows the first value in it.
+"""
+
+from typing import List, Optional, Tuple, Sequence, TypeVar
+
+from bisect import bisect_right
+
+from itertools import chain
+
+from logging_lazy_lists import AccessLogger, LoggingLazyList, CallLogEntry
+
+from ascii_diagrams import Appearance
+
+
+KEYFRAME_INTERVAL = 1024
+"""The default (maximum) number of events between keyframes."""
+
+KEYFRAME_BLOCK_SIZE = 256
+"""The number of cells in each block of a keyframe."""
+
+
+T = TypeVar("T")
+
+
+def _blocks(cells: List[T]) -> List[Tuple[T, ...]]:
+    """Split a list of cells into keyframe blocks."""
+    return [
+        tuple(cells[i : i + KEYFRAME_BLOCK_SIZE])
+        for i in range(0, len(cells), KEYFRAME_BLOCK_SIZE)
+    ]
+
+
+class ActiveCall:
+    """
+    A call whose access log has been flattened into lists for efficient
+    lookup during playback.
+    """
+
+    index: int
+    """The array index being computed."""
+
+    start_time: int
+
+    access_start_times: List[int]
+    access_indices: List[int]
+    """The start times and indices of each access made during the call."""
+
+    def __init__(self, call_record: CallLogEntry) -> None:
+        self.index = call_record.index
+        self.start_time = call_record.start_time
+        access_log = call_record.access_log
+        self.access_start_times = [access.start_time for access in access_log]
+        self.access_indices = [access.index for access in access_log]
+
+    def sources(self, t: int) -> List[int]:
+        """The indices accessed by this call up to (and including) time t."""
+        return self.access_indices[: bisect_right(self.access_start_times, t)]
+
+
+class AnimationTimeline:
+    """
+    The state of each displayed array at a particular point in time, which
+    may be efficiently advanced through a logged trace.
+
+    Use :py:meth:`seek` to jump to an arbitrary time and :py:meth:`advance` to
+    move forward, then read the state of each array from :py:attr:`values`,
+    :py:attr:`appearances` and :py:meth:`active_call`.
+    """
+
+    time: int
+    """The current time."""
+
+    values: List[List[Optional[int]]]
+    appearances: List[List[Appearance]]
+    """The currently displayed value and appearance of each array cell."""
+
+    changed: List[bool]
+    """
+    For each array, has its values or appearances changed? Set by
+    :py:meth:`seek` and :py:meth:`advance`, cleared by the user (e.g. once the
+    array has been redrawn).
+    """
+
+    _final_values: List[List[Optional[int]]]
+    """The final value of each array cell."""
+
+    _first_access_times: List[List[int]]
+    _last_access_times: List[List[int]]
+    """The first and last access times of each array cell (-1 if never)."""
+
+    _call_records: List[List[CallLogEntry]]
+    _call_end_times: List[List[int]]
+    """The calls made for each array (in start time order)."""
+
+    _next_calls: List[int]
+    """
+    For each array, the index (into _call_records) of the first call which had
+    not finished by the current time.
+    """
+
+    _active_calls: List[Optional[ActiveCall]]
+    """Cached :py:class:`ActiveCall` for each array's current call."""
+
+    _event_times: List[int]
+    _events: List[Tuple[int, int, Appearance]]
+    """
+    Changes to cell appearance, sorted by time: (array number, index, new
+    appearance). Values become visible whenever their cell becomes solid.
+    """
+
+    _next_event: int
+    """Index of the first event in _events which has not yet been applied."""
+
+    keyframe_interval: int
+    """The (maximum) number of events between keyframes."""
+
+    _keyframe_times: List[int]
+    _keyframes: List[
+        Tuple[
+            int,
+            List[List[Tuple[Optional[int], ...]]],
+            List[List[Tuple[Appearance, ...]]],
+        ]
+    ]
+    """
+    Snapshots of the state at various times: (next_event, values,
+    appearances). The values and appearances of each array are split into
+    blocks of :py:data:`KEYFRAME_BLOCK_SIZE` cells, with unchanged blocks
+    shared between consecutive keyframes.
+    """
+
+    def __init__(
+        self,
+        arrays: Sequence[LoggingLazyList[int]],
+        logger: AccessLogger,
+        keyframe_interval: int = KEYFRAME_INTERVAL,
+    ) -> None:
+        self._final_values = [
+            [v if isinstance(v, int) else None for v in array.iter_current_pages()]
+            for array in arrays
+        ]
+        self._first_access_times = [
+            [
+                logger.first_access_time.get((array.name, i), -1)
+                for i in range(array.num_pages)
+            ]
+            for array in arrays
+        ]
+        self._last_access_times = [
+            [
+                logger.last_access_time.get((array.name, i), -1)
+                for i in range(array.num_pages)
+            ]
+            for array in arrays
+        ]
+
+        array_numbers = {array.name: n for n, array in enumerate(arrays)}
+        self._call_records = [[] for _ in arrays]
+        for call_record in logger.call_log:
+            n = array_numbers.get(call_record.array_name)
+            if n is not None:
+                self._call_records[n].append(call_record)
+        self._call_end_times = [
+            [call_record.end_time or 0 for call_record in call_records]
+            for call_records in self._call_records
+        ]
+
+        events = []
+        for n, (first_times, last_times) in enumerate(
+            zip(self._first_access_times, self._last_access_times)
+        ):
+            final_array = n == len(arrays) - 1
+            for i, (first, last) in enumerate(zip(first_times, last_times)):
+                if first >= 0:
+                    events.append((first, n, i, Appearance.solid_border))
+                if last >= 0 and not final_array:
+                    events.append((last + 1, n, i, Appearance.dashed_border))
+        events.sort(key=lambda event: event[0])
+        self._event_times = [event[0] for event in events]
+        self._events = [event[1:] for event in events]
+
+        if keyframe_interval < 1:
+            raise ValueError("The keyframe interval must be at least 1.")
+        self.keyframe_interval = keyframe_interval
+        self._build_keyframes()
+
+        self.seek(0)
+
+    def _cell_state(
+        self, n: int, i: int, t: int
+    ) -> Tuple[Optional[int], Appearance]:
+        """Compute the value and appearance of a cell at time t from scratch."""
+        first = self._first_access_times[n][i]
+        last = self._last_access_times[n][i]
+        final_array = n == len(self._final_values) - 1
+        if t < first:
+            return (None, Appearance.dashed_border)
+        elif t > last and not final_array:
+            return (self._final_values[n][i], Appearance.dashed_border)
+        else:
+            return (self._final_values[n][i], Appearance.solid_border)
+
+    def _build_keyframes(self) -> None:
+        """Replay every event, taking a keyframe every keyframe_interval."""
+        # NB: The state at time zero (before any events) is computed from
+        # scratch.
+        self.time = 0
+        self.values = []
+        self.appearances = []
+        for n, final_values in enumerate(self._final_values):
+            states = [self._cell_state(n, i, 0) for i in range(len(final_values))]
+            self.values.append([value for value, _ in states])
+            self.appearances.append([appearance for _, appearance in states])
+        self.changed = [True] * len(self._final_values)
+        self._next_event = bisect_right(self._event_times, 0)
+
+        block_size = KEYFRAME_BLOCK_SIZE
+        value_blocks = [_blocks(values) for values in self.values]
+        appearance_blocks = [_blocks(appearances) for appearances in self.appearances]
+
+        self._keyframe_times = []
+        self._keyframes = []
+        while True:
+            self._keyframe_times.append(self.time)
+            self._keyframes.append(
+                (self._next_event, value_blocks, appearance_blocks)
+            )
+            next_keyframe_event = self._next_event + self.keyframe_interval - 1
+            if next_keyframe_event >= len(self._events):
+                break
+            first_event = self._next_event
+            self.time = self._event_times[next_keyframe_event]
+            self._apply_events(self.time)
+
+            # Copy only the blocks changed by the events just applied
+            value_blocks = [list(blocks) for blocks in value_blocks]
+            appearance_blocks = [list(blocks) for blocks in appearance_blocks]
+            for n, block in {
+                (n, i // block_size)
+                for n, i, _ in self._events[first_event : self._next_event]
+            }:
+                start = block * block_size
+                value_blocks[n][block] = tuple(
+                    self.values[n][start : start + block_size]
+                )
+                appearance_blocks[n][block] = tuple(
+                    self.appearances[n][start : start + block_size]
+                )
+
+    def seek(self, t: int) -> None:
+        """Move to an arbitrary point in time."""
+        keyframe = max(0, bisect_right(self._keyframe_times, t) - 1)
+        next_event, value_blocks, appearance_blocks = self._keyframes[keyframe]
+        self.values = [list(chain.from_iterable(blocks)) for blocks in value_blocks]
+        self.appearances = [
+            list(chain.from_iterable(blocks)) for blocks in appearance_blocks
+        ]
+        self._next_event = next_event
+        self.time = t
+        self._apply_events(t)
+
+        # NB: Keyframes are taken every keyframe_interval events so seeking
+        # never replays more events than that, however long the trace.
+        assert self._next_event - next_event < self.keyframe_interval
+
+        self.changed = [True] * len(self._final_values)
+
+        self._next_calls = [
+            bisect_right(end_times, t - 1) for end_times in self._call_end_times
+        ]
+        self._active_calls = [None] * len(self._call_records)
+
+    def _apply_events(self, t: int) -> None:
+        """Apply the (as yet unapplied) events up to time t."""
+        while (
+            self._next_event < len(self._events)
+            and self._event_times[self._next_event] <= t
+        ):
+            n, i, appearance = self._events[self._next_event]
+            self.appearances[n][i] = appearance
+            self.changed[n] = True
+            if appearance == Appearance.solid_border:
+                self.values[n][i] = self._final_values[n][i]
+            self._next_event += 1
+
+    def advance(self, t: int) -> None:
+        """Move forward to time t (which must not be in the past)."""
+        if t < self.time:
+            raise ValueError("Cannot advance backwards in time; use seek.")
+        self.time = t
+
+        self._apply_events(t)
+
+        for n, end_times in enumerate(self._call_end_times):
+            next_call = self._next_calls[n]
+            while next_call < len(end_times) and end_times[next_call] < t:
+                next_call += 1
+                self._active_calls[n] = None
+            self._next_calls[n] = next_call
+
+    def active_call(self, n: int) -> Optional[ActiveCall]:
+        """
+        Get the call (if any) in progress for array number 'n' at the current
+        time.
+        """
+        call_records = self._call_records[n]
+        next_call = self._next_calls[n]
+        if (
+            next_call < len(call_records)
+            and call_records[next_call].start_time <= self.time
+        ):
+            active_call = self._active_calls[n]
+            if active_call is None:
+                active_call = self._active_calls[n] = ActiveCall(
+                    call_records[next_call]
+                )
+            return active_call
+        else:
+            return None
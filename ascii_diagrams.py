@@ -10,12 +10,17 @@ Routines for drawing ASCII-art diagrams of arrays like so::
      ===== ===== ===== _ _ _ _ _ _
     | 97  |  8  | 33  |     ;     ;
     '====='====='====='- - -'- - -
+
+For long arrays, both may be restricted to a window of cells (e.g. one which
+fits in the terminal), positioned using a :py:class:`Viewport`.
 """
 
-from typing import Sequence, Optional
+from typing import Sequence, Optional, Tuple
 
 from dataclasses import dataclass
 
+from functools import lru_cache
+
 from enum import Enum
 
 
@@ -31,106 +36,216 @@ class Appearance(Enum):
     solid_border = "solid_border"
 
 
+@lru_cache(maxsize=4096)
+def _draw_cell(
+    value: Optional[int],
+    appearance: Appearance,
+    last_appearance: Appearance,
+    opt: DrawingOptions,
+) -> Tuple[str, str, str]:
+    """
+    Render the (top, middle, bottom) fragments of a single array cell. The
+    middle fragment starts with the border shared with the cell to the left.
+    """
+    if appearance == Appearance.hidden or appearance == Appearance.no_border:
+        top = [" "] * opt.box_width
+        bottom = [" "] * opt.box_width
+    else:
+        if appearance == Appearance.solid_border:
+            top = [" "] + (["="] * (opt.box_width - 1))
+            bottom = ["'"] + (["="] * (opt.box_width - 1))
+        else:
+            top = [" "] + (["_"] * (opt.box_width - 1))
+            bottom = ["'"] + (["-"] * (opt.box_width - 1))
+        if appearance == Appearance.dashed_border:
+            for j in range(2, opt.box_width, 2):
+                top[j] = " "
+                bottom[j] = " "
+
+    if (
+        last_appearance == Appearance.solid_border
+        or appearance == Appearance.solid_border
+    ):
+        middle = "|"
+    elif (
+        last_appearance == Appearance.dashed_border
+        or appearance == Appearance.dashed_border
+    ):
+        middle = ";"
+    else:
+        middle = " "
+
+    if value is not None and appearance != Appearance.hidden:
+        middle += "{:^{}d}".format(value, opt.box_width - 1)
+    else:
+        middle += " " * (opt.box_width - 1)
+
+    return ("".join(top), middle, "".join(bottom))
+
+
+class Viewport:
+    """
+    A window of 'size' cells onto arrays of 'length' cells which scrolls to
+    keep a point of interest in view.
+    """
+
+    size: int
+    length: int
+
+    first: int
+    """The index of the first cell in view."""
+
+    margin: int
+    """
+    The number of cells at each edge of the viewport which trigger scrolling
+    when the point of interest enters them.
+    """
+
+    def __init__(self, size: int, length: int) -> None:
+        self.size = max(1, size)
+        self.length = length
+        self.first = 0
+        self.margin = self.size // 4
+
+    def follow(self, index: int, *others: int) -> None:
+        """
+        Scroll (if necessary) to bring 'index' into view, along with as many
+        of 'others' as will fit.
+        """
+        lo = hi = index
+        for other in others:
+            if max(hi, other) - min(lo, other) < self.size - (2 * self.margin):
+                lo = min(lo, other)
+                hi = max(hi, other)
+
+        first = self.first
+        if lo < first + self.margin:
+            first = lo - self.margin
+        elif hi > first + self.size - 1 - self.margin:
+            first = hi - self.size + 1 + self.margin
+        self.first = max(0, min(first, self.length - self.size))
+
+
 def draw_array(
     values: Sequence[Optional[int]],
     appearances: Sequence[Appearance],
     opt: DrawingOptions = DrawingOptions(),
+    first: int = 0,
+    count: Optional[int] = None,
 ) -> str:
-    top = ""
-    middle = ""
-    bottom = ""
-
-    if values:
-        for i, (value, appearance) in enumerate(zip(values, appearances)):
-            if appearance == Appearance.hidden or appearance == Appearance.no_border:
-                new_top = [" "] * opt.box_width
-                new_bottom = [" "] * opt.box_width
-            else:
-                if appearance == Appearance.solid_border:
-                    new_top = [" "] + (["="] * (opt.box_width - 1))
-                    new_bottom = ["'"] + (["="] * (opt.box_width - 1))
-                else:
-                    new_top = [" "] + (["_"] * (opt.box_width - 1))
-                    new_bottom = ["'"] + (["-"] * (opt.box_width - 1))
-                if appearance == Appearance.dashed_border:
-                    for j in range(2, opt.box_width, 2):
-                        new_top[j] = " "
-                        new_bottom[j] = " "
-            top += "".join(new_top)
-            bottom += "".join(new_bottom)
-
-            last_appearence = appearances[i - 1] if i >= 1 else appearance
-            middle += (
-                "|"
-                if (
-                    last_appearence == Appearance.solid_border
-                    or appearance == Appearance.solid_border
-                )
-                else (
-                    ";"
-                    if (
-                        last_appearence == Appearance.dashed_border
-                        or appearance == Appearance.dashed_border
-                    )
-                    else " "
-                )
+    """
+    Draw an array. If 'count' is given, only the cells from 'first' to
+    'first + count' are drawn.
+    """
+    # NB: Rows are assembled from (cached) pre-rendered cell fragments since
+    # the same cells appear over and over again in every frame.
+    top = []
+    middle = []
+    bottom = []
+
+    stop = len(values) if count is None else min(len(values), first + count)
+    if first < stop:
+        last_appearance = appearances[first - 1 if first > 0 else 0]
+        for i in range(first, stop):
+            value = values[i]
+            appearance = appearances[i]
+            cell_top, cell_middle, cell_bottom = _draw_cell(
+                value, appearance, last_appearance, opt
+            )
+            top.append(cell_top)
+            middle.append(cell_middle)
+            bottom.append(cell_bottom)
+            last_appearance = appearance
+
+        if stop < len(values):
+            # Draw the border shared with the first cell out of view
+            _, next_middle, next_bottom = _draw_cell(
+                values[stop], appearances[stop], last_appearance, opt
             )
+            middle.append(next_middle[0])
+            bottom.append(next_bottom[0])
+        elif last_appearance == Appearance.solid_border:
+            middle.append("|")
+            bottom.append("'")
+        elif last_appearance == Appearance.dashed_border:
+            middle.append(";")
+            bottom.append("'")
+        else:
+            middle.append(" ")
+            bottom.append(" ")
 
-            if value is not None and appearance != Appearance.hidden:
-                middle += "{:^{}d}".format(value, opt.box_width - 1)
-            else:
-                middle += " " * (opt.box_width - 1)
+    return "\n".join(
+        ("".join(top).rstrip(), "".join(middle).rstrip(), "".join(bottom).rstrip())
+    )
 
-        if appearance == Appearance.solid_border:
-            middle += "|"
-            bottom += "'"
-        elif appearance == Appearance.dashed_border:
-            middle += ";"
-            bottom += "'"
-        else:
-            middle += " "
-            bottom += " "
 
-    return "\n".join((top.rstrip(), middle.rstrip(), bottom.rstrip()))
+@lru_cache(maxsize=256)
+def _draw_connector(
+    left_in: bool, right_in: bool, mark: str, opt: DrawingOptions
+) -> str:
+    """
+    Render the fragment of the horizontal connector line below one array cell.
+    'mark' is the character drawn in the middle of the cell.
+    """
+    lhs = opt.box_width // 2
+    rhs = opt.box_width - lhs - 1
+    return (
+        (("-" * lhs) if left_in else (" " * lhs))
+        + mark
+        + (("-" * rhs) if right_in else (" " * rhs))
+    )
 
 
 def draw_connections(
-    sources: Sequence[int], dest: int, opt: DrawingOptions = DrawingOptions()
+    sources: Sequence[int],
+    dest: int,
+    opt: DrawingOptions = DrawingOptions(),
+    first: int = 0,
+    count: Optional[int] = None,
 ) -> str:
+    """
+    Draw the connections from the 'sources' cells of one array to the 'dest'
+    cell of the array below. If 'count' is given, only the part below the
+    cells from 'first' to 'first + count' is drawn.
+    """
     lhs = opt.box_width // 2
-    rhs = opt.box_width - lhs - 1
 
     if not sources:
         return "\n\n"
 
     lines = []
 
-    sources = sorted(sources)
-    line = ""
-    for x in range(max(sources) + 1):
-        if x in sources:
-            line += (" " * lhs) + "|" + (" " * rhs)
-        else:
-            line += " " * opt.box_width
-
-    lines.append(line.rstrip())
-
-    leftmost = min(min(sources), dest)
-    rightmost = max(max(sources), dest)
-
-    line = ""
-    for x in range(rightmost + 1):
-        left_in = leftmost < x <= rightmost
-        right_in = leftmost <= x < rightmost
-        line += ("-" * lhs) if left_in else (" " * lhs)
-        if x >= leftmost and x <= rightmost:
-            line += "+" if x == dest or x in sources else "-"
-        else:
-            line += " "
-        line += ("-" * rhs) if right_in else (" " * rhs)
-    lines.append(line)
+    source_set = set(sources)
+    leftmost = min(min(source_set), dest)
+    rightmost = max(max(source_set), dest)
+    stop = rightmost + 1 if count is None else first + count
+
+    tick = _draw_connector(False, False, "|", opt)
+    blank = " " * opt.box_width
+    lines.append(
+        "".join(
+            tick if x in source_set else blank
+            for x in range(first, min(stop, max(source_set) + 1))
+        ).rstrip()
+    )
+
+    line = []
+    if max(first, leftmost) < min(stop, rightmost + 1):
+        line.append(blank * max(0, leftmost - first))
+        for x in range(max(first, leftmost), min(stop, rightmost + 1)):
+            line.append(
+                _draw_connector(
+                    leftmost < x,
+                    x < rightmost,
+                    "+" if x == dest or x in source_set else "-",
+                    opt,
+                )
+            )
+    lines.append("".join(line))
 
-    line = (" " * (dest * opt.box_width)) + (" " * lhs) + "|"
-    lines.append(line)
+    if first <= dest < stop:
+        lines.append((" " * ((dest - first) * opt.box_width)) + (" " * lhs) + "|")
+    else:
+        lines.append("")
 
     return "\n".join(lines)
@@ -0,0 +1,412 @@
+"""
+Benchmarks for the streaming wavelet toy.
+
+Every combination of wavelet, computation order (see
+:py:data:`streaming_wavelet_toy.ORDERS`) and signal length (increasing
+geometrically) is run, measuring:
+
+* The throughput (samples per second) when values are computed with an
+  :py:class:`~logging_lazy_lists.AccessLogger` recording every call and
+  access.
+* The throughput when nothing is recorded, and hence the overhead of the
+  logger.
+* The peak memory used (as reported by :py:mod:`tracemalloc`) when tracing.
+* The time taken to set up the animation and to render each frame.
+
+Results are written as JSON. Two sets of results may be compared to find
+regressions::
+
+    $ python benchmark.py run -O before.json
+    $ # ...make changes...
+    $ python benchmark.py run -O after.json
+    $ python benchmark.py compare before.json after.json
+"""
+
+from typing import (
+    Any,
+    Dict,
+    List,
+    Iterator,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TextIO,
+)
+
+import sys
+
+import time
+
+import random
+
+import tracemalloc
+
+import json
+
+import platform
+
+from argparse import ArgumentParser
+
+from logging_lazy_lists import AccessLogger, LoggingLazyList
+
+from compact_access_logger import CompactAccessLogger
+
+from counting_logger import NullLogger
+
+from vc2_wavelet_definitions import WaveletFilters
+
+from streaming_wavelet_toy import (
+    ORDERS,
+    construct_all_arrays,
+    generate_animation,
+    parse_wavelet,
+)
+
+
+LOGGERS: Mapping[str, type] = {
+    "records": AccessLogger,
+    "compact": CompactAccessLogger,
+}
+"""The loggers which may be benchmarked, by (command line) name."""
+
+
+METRICS: Mapping[str, bool] = {
+    "samples_per_second": True,
+    "untraced_samples_per_second": True,
+    "logger_overhead": False,
+    "peak_memory_bytes": False,
+    "animation_setup_seconds": False,
+    "frame_render_seconds": False,
+}
+"""
+The metrics recorded for each benchmark. Maps from metric name to True if
+larger values are better or False if smaller values are better.
+"""
+
+
+def geometric_sizes(min_values: int, max_values: int, factor: int) -> List[int]:
+    """The signal lengths from min_values to max_values (inclusive)."""
+    if min_values < 1 or factor < 2:
+        raise ValueError("min_values must be at least 1 and factor at least 2.")
+    sizes = []
+    size = min_values
+    while size <= max_values:
+        sizes.append(size)
+        size *= factor
+    return sizes
+
+
+def _compute(
+    input_values: List[int],
+    wavelet: WaveletFilters,
+    order: str,
+    logger: AccessLogger,
+) -> Tuple[List[LoggingLazyList[int]], float]:
+    """
+    Construct the arrays and compute their values, returning the arrays and
+    the time taken (seconds).
+    """
+    start = time.perf_counter()
+    arrays = construct_all_arrays(input_values, wavelet, logger)
+    ORDERS[order](arrays, wavelet)
+    return (arrays, time.perf_counter() - start)
+
+
+def run_benchmark(
+    wavelet: WaveletFilters,
+    order: str,
+    num_values: int,
+    logger_name: str = "records",
+    repeats: int = 3,
+    frames: int = 20,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Benchmark a single wavelet, computation order and signal length,
+    returning a dictionary of results (see :py:data:`METRICS`).
+
+    Timings are the best of 'repeats' runs. The mean render time of the first
+    'frames' frames of the animation is reported.
+    """
+    rand = random.Random(seed)
+    input_values = [rand.randrange(100) for _ in range(num_values)]
+    logger_type = LOGGERS[logger_name]
+
+    traced_time = min(
+        _compute(input_values, wavelet, order, logger_type())[1]
+        for _ in range(repeats)
+    )
+    untraced_time = min(
+        _compute(input_values, wavelet, order, NullLogger())[1]
+        for _ in range(repeats)
+    )
+
+    # NB: Memory is measured in a separate run since tracemalloc slows
+    # everything down considerably
+    tracemalloc.start()
+    try:
+        logger = logger_type()
+        arrays, _ = _compute(input_values, wavelet, order, logger)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    animation = generate_animation(arrays, logger)
+    start = time.perf_counter()
+    num_frames = 0
+    if next(animation, None) is not None:
+        num_frames += 1
+    setup_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(frames - 1):
+        if next(animation, None) is None:
+            break
+        num_frames += 1
+    frame_time = (time.perf_counter() - start) / max(1, num_frames - 1)
+
+    return {
+        "wavelet": wavelet.name,
+        "order": order,
+        "num_values": num_values,
+        "logger": logger_name,
+        "samples_per_second": num_values / traced_time,
+        "untraced_samples_per_second": num_values / untraced_time,
+        "logger_overhead": traced_time / untraced_time,
+        "peak_memory_bytes": peak_memory,
+        "animation_setup_seconds": setup_time,
+        "frame_render_seconds": frame_time,
+    }
+
+
+def run_benchmarks(
+    wavelets: List[WaveletFilters],
+    orders: List[str],
+    sizes: List[int],
+    logger_name: str = "records",
+    repeats: int = 3,
+    frames: int = 20,
+    progress: Optional[TextIO] = None,
+) -> Dict[str, Any]:
+    """
+    Run every combination of wavelet, order and size, returning a
+    JSON-serialisable dictionary of results.
+    """
+    results = []
+    for wavelet in wavelets:
+        for order in orders:
+            for num_values in sizes:
+                if progress is not None:
+                    progress.write(f"{wavelet.name} {order} {num_values}...\n")
+                    progress.flush()
+                results.append(
+                    run_benchmark(
+                        wavelet, order, num_values, logger_name, repeats, frames
+                    )
+                )
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def _key(result: Mapping[str, Any]) -> Tuple[str, str, int, str]:
+    return (
+        result["wavelet"],
+        result["order"],
+        result["num_values"],
+        result["logger"],
+    )
+
+
+class Change(NamedTuple):
+    """The change in a metric between two benchmark runs."""
+
+    key: Tuple[str, str, int, str]
+    """(wavelet, order, num_values, logger)"""
+
+    metric: str
+    before: float
+    after: float
+
+    regression: bool
+    """True if the metric got worse by more than the threshold."""
+
+    @property
+    def ratio(self) -> float:
+        return self.after / self.before if self.before else float("inf")
+
+
+def compare_results(
+    before: Mapping[str, Any], after: Mapping[str, Any], threshold: float = 0.1,
+) -> Iterator[Change]:
+    """
+    Compare the metrics of each benchmark common to two sets of results. A
+    change is flagged as a regression if the metric got worse by more than
+    'threshold' (a fraction, e.g. 0.1 for 10%).
+    """
+    before_results = {_key(r): r for r in before["results"]}
+    for result in after["results"]:
+        key = _key(result)
+        if key not in before_results:
+            continue
+        for metric, larger_is_better in METRICS.items():
+            old = before_results[key][metric]
+            new = result[metric]
+            if larger_is_better:
+                regression = new < old * (1 - threshold)
+            else:
+                regression = new > old * (1 + threshold)
+            yield Change(key, metric, old, new, regression)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks.")
+    run_parser.add_argument(
+        "--wavelet",
+        "-w",
+        action="append",
+        choices=(
+            [str(f.value) for f in WaveletFilters] + [f.name for f in WaveletFilters]
+        ),
+        help="""
+            Wavelet to benchmark (may be given several times). Default: all.
+        """,
+    )
+    run_parser.add_argument(
+        "--order",
+        "-o",
+        action="append",
+        choices=list(ORDERS),
+        help="""
+            Computation order to benchmark (may be given several times).
+            Default: all.
+        """,
+    )
+    run_parser.add_argument(
+        "--min-values",
+        type=int,
+        default=16,
+        help="Shortest signal length. Default: %(default)s.",
+    )
+    run_parser.add_argument(
+        "--max-values",
+        type=int,
+        default=1024,
+        help="Longest signal length. Default: %(default)s.",
+    )
+    run_parser.add_argument(
+        "--factor",
+        type=int,
+        default=4,
+        help="Factor between successive signal lengths. Default: %(default)s.",
+    )
+    run_parser.add_argument(
+        "--logger",
+        "-l",
+        choices=list(LOGGERS),
+        default="records",
+        help="Access logger to use when tracing. Default: %(default)s.",
+    )
+    run_parser.add_argument(
+        "--repeats",
+        "-r",
+        type=int,
+        default=3,
+        help="Number of runs to take the best time of. Default: %(default)s.",
+    )
+    run_parser.add_argument(
+        "--frames",
+        "-f",
+        type=int,
+        default=20,
+        help="Number of animation frames to render. Default: %(default)s.",
+    )
+    run_parser.add_argument(
+        "--output",
+        "-O",
+        help="File to write the JSON results to. Default: stdout.",
+    )
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="Compare two sets of results."
+    )
+    compare_parser.add_argument("before", help="Baseline JSON results.")
+    compare_parser.add_argument("after", help="New JSON results.")
+    compare_parser.add_argument(
+        "--threshold",
+        "-T",
+        type=float,
+        default=0.1,
+        help="""
+            Fractional change in a metric to consider a regression. Default:
+            %(default)s.
+        """,
+    )
+    compare_parser.add_argument(
+        "--all",
+        "-a",
+        action="store_true",
+        help="Show all changes, not just regressions.",
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run_benchmarks(
+            (
+                [parse_wavelet(w) for w in args.wavelet]
+                if args.wavelet
+                else list(WaveletFilters)
+            ),
+            args.order or list(ORDERS),
+            geometric_sizes(args.min_values, args.max_values, args.factor),
+            args.logger,
+            args.repeats,
+            args.frames,
+            progress=sys.stderr,
+        )
+        if args.output is not None:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        else:
+            json.dump(results, sys.stdout, indent=2)
+            print()
+        return 0
+    elif args.command == "compare":
+        with open(args.before) as f:
+            before = json.load(f)
+        with open(args.after) as f:
+            after = json.load(f)
+
+        num_regressions = 0
+        for change in compare_results(before, after, args.threshold):
+            num_regressions += change.regression
+            if change.regression or args.all:
+                wavelet, order, num_values, logger = change.key
+                print(
+                    "{} {} {} n={} {} ({}): {:.4g} -> {:.4g} ({:+.1%})".format(
+                        "REGRESSION" if change.regression else "          ",
+                        wavelet,
+                        order,
+                        num_values,
+                        logger,
+                        change.metric,
+                        change.before,
+                        change.after,
+                        change.ratio - 1,
+                    )
+                )
+        print(f"{num_regressions} regression(s) found.")
+        return 1 if num_regressions else 0
+    else:
+        raise NotImplementedError(args.command)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+r"""
+A memory-efficient alternative to :py:class:`AccessLogger`.
+
+Rather than allocating a dataclass per call and access, the
+:py:class:`CompactAccessLogger` stores its trace in typed, parallel arrays
+('columns') with array names interned as small integers. The same query
+surface as :py:class:`AccessLogger` (:py:attr:`~AccessLogger.call_log`,
+:py:attr:`~AccessLogger.first_access_time` and
+:py:attr:`~AccessLogger.last_access_time`) is provided by lightweight views
+onto these columns.
+"""
+
+from typing import (
+    Optional,
+    List,
+    Tuple,
+    Dict,
+    MutableMapping,
+    Sequence,
+    Iterator,
+    overload,
+)
+
+from array import array
+
+from logging_lazy_lists import AccessLogger, AccessRecord
+
+
+class CompactAccessLogger(AccessLogger):
+    """
+    An :py:class:`AccessLogger` which stores its trace in compact columnar
+    form.
+
+    NB: Array indices must be non-negative.
+    """
+
+    _array_names: List[str]
+    _array_ids: Dict[str, int]
+    """Interned array names."""
+
+    _call_array: "array[int]"
+    _call_index: "array[int]"
+    _call_start: "array[int]"
+    _call_end: "array[int]"
+    """Columns describing each call (end times are -1 until known)."""
+
+    _call_id_stack: List[int]
+    """The IDs (i.e. column indices) of the calls currently in progress."""
+
+    _access_call: "array[int]"
+    _access_array: "array[int]"
+    _access_index: "array[int]"
+    _access_start: "array[int]"
+    _access_end: "array[int]"
+    """
+    Columns describing each access, including the ID of the call it was made
+    within (or -1 when made outside of a call).
+
+    To save space, array and call IDs are stored using narrower types than
+    indices and times (limiting traces to 2**16 arrays and 2**31 calls).
+    """
+
+    _first_times: List["array[int]"]
+    _last_times: List["array[int]"]
+    """
+    For each array ID, the first and last access time of each index (or -1 if
+    never accessed).
+    """
+
+    _accesses_by_call: Optional[Tuple["array[int]", "array[int]"]]
+    """
+    Cached index of accesses grouped by call: an array of access IDs sorted by
+    call, and the offset into that array of each call's first access. Reset to
+    None whenever a new access is logged.
+    """
+
+    def __init__(self) -> None:
+        # NB: AccessLogger.__init__ is deliberately not called since the
+        # attributes it initialises are replaced by views.
+        self._time = 0
+
+        self._array_names = []
+        self._array_ids = {}
+
+        self._call_array = array("H")
+        self._call_index = array("q")
+        self._call_start = array("q")
+        self._call_end = array("q")
+        self._call_id_stack = []
+
+        self._access_call = array("i")
+        self._access_array = array("H")
+        self._access_index = array("q")
+        self._access_start = array("q")
+        self._access_end = array("q")
+
+        self._first_times = []
+        self._last_times = []
+
+        self._accesses_by_call = None
+
+        self.first_access_time = CompactAccessTimes(self, self._first_times)
+        self.last_access_time = CompactAccessTimes(self, self._last_times)
+
+    @property
+    def call_log(self) -> "CompactCallLog":
+        return CompactCallLog(self)
+
+    def intern(self, array_name: str) -> int:
+        """Get the array ID for a given array name."""
+        array_id = self._array_ids.get(array_name)
+        if array_id is None:
+            array_id = self._array_ids[array_name] = len(self._array_names)
+            self._array_names.append(array_name)
+            self._first_times.append(array("q"))
+            self._last_times.append(array("q"))
+        return array_id
+
+    def array_name(self, array_id: int) -> str:
+        """Get the array name for a given array ID."""
+        return self._array_names[array_id]
+
+    def begin_call(self, array_name: str, index: int) -> int:
+        call_id = len(self._call_start)
+        self._call_array.append(self.intern(array_name))
+        self._call_index.append(index)
+        self._call_start.append(self.time)
+        self._call_end.append(-1)
+        self._call_id_stack.append(call_id)
+        return call_id
+
+    def end_call(self, call: int) -> None:
+        assert self._call_id_stack.pop(-1) == call
+        self._call_end[call] = self.time
+
+    def begin_access(self, array_name: str, index: int) -> int:
+        access_id = len(self._access_start)
+        self._access_call.append(
+            self._call_id_stack[-1] if self._call_id_stack else -1
+        )
+        self._access_array.append(self.intern(array_name))
+        self._access_index.append(index)
+        self._access_start.append(self.time)
+        self._access_end.append(-1)
+        self._accesses_by_call = None
+        return access_id
+
+    def end_access(self, access: int) -> None:
+        t = self.time
+
+        self._access_end[access] = t
+
+        array_id = self._access_array[access]
+        index = self._access_index[access]
+        first_times = self._first_times[array_id]
+        last_times = self._last_times[array_id]
+        if index >= len(first_times):
+            self._grow_times(array_id, index)
+
+        if first_times[index] == -1:
+            first_times[index] = t
+        last_times[index] = t
+
+    def _grow_times(self, array_id: int, index: int) -> None:
+        """Extend an array's (equal length) time columns to include 'index'."""
+        first_times = self._first_times[array_id]
+        last_times = self._last_times[array_id]
+        new_length = max(index + 1, 2 * len(first_times))
+        padding = array("q", [-1]) * (new_length - len(first_times))
+        first_times.extend(padding)
+        last_times.extend(padding)
+
+    def get_access_ids(self, call_id: int) -> Sequence[int]:
+        """
+        Get the IDs of the accesses made (directly) within a given call, in
+        the order they were made.
+        """
+        if self._accesses_by_call is None:
+            # Counting sort of accesses by call ID
+            offsets = array("q", [0]) * (len(self._call_start) + 1)
+            for owner in self._access_call:
+                if owner >= 0:
+                    offsets[owner + 1] += 1
+            for i in range(1, len(offsets)):
+                offsets[i] += offsets[i - 1]
+            order = array("q", [0]) * offsets[-1]
+            fill = array("q", offsets)
+            for access_id, owner in enumerate(self._access_call):
+                if owner >= 0:
+                    order[fill[owner]] = access_id
+                    fill[owner] += 1
+            self._accesses_by_call = (order, offsets)
+
+        order, offsets = self._accesses_by_call
+        return order[offsets[call_id] : offsets[call_id + 1]]
+
+    def get_access_record(self, access_id: int) -> AccessRecord:
+        """Get the :py:class:`AccessRecord` for a given access ID."""
+        end_time = self._access_end[access_id]
+        return AccessRecord(
+            self._array_names[self._access_array[access_id]],
+            self._access_index[access_id],
+            self._access_start[access_id],
+            end_time if end_time >= 0 else None,
+        )
+
+
+class CompactCallRecord:
+    """
+    A view of a single call in a :py:class:`CompactAccessLogger` providing the
+    same attributes as a :py:class:`CallRecord`.
+    """
+
+    __slots__ = ("_logger", "call_id")
+
+    _logger: CompactAccessLogger
+    call_id: int
+
+    def __init__(self, logger: CompactAccessLogger, call_id: int) -> None:
+        self._logger = logger
+        self.call_id = call_id
+
+    @property
+    def array_name(self) -> str:
+        return self._logger.array_name(self._logger._call_array[self.call_id])
+
+    @property
+    def index(self) -> int:
+        return self._logger._call_index[self.call_id]
+
+    @property
+    def start_time(self) -> int:
+        return self._logger._call_start[self.call_id]
+
+    @property
+    def end_time(self) -> Optional[int]:
+        end_time = self._logger._call_end[self.call_id]
+        return end_time if end_time >= 0 else None
+
+    @property
+    def access_log(self) -> List[AccessRecord]:
+        return [
+            self._logger.get_access_record(access_id)
+            for access_id in self._logger.get_access_ids(self.call_id)
+        ]
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}(array_name={self.array_name!r}, "
+            f"index={self.index!r}, start_time={self.start_time!r}, "
+            f"end_time={self.end_time!r})"
+        )
+
+
+class CompactCallLog(Sequence[CompactCallRecord]):
+    """
+    A read-only view of the calls logged by a :py:class:`CompactAccessLogger`,
+    ordered by start time.
+    """
+
+    def __init__(self, logger: CompactAccessLogger) -> None:
+        self._logger = logger
+
+    def __len__(self) -> int:
+        return len(self._logger._call_start)
+
+    @overload
+    def __getitem__(self, index: int) -> CompactCallRecord:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[CompactCallRecord]:
+        ...
+
+    def __getitem__(self, index):  # type: ignore
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return CompactCallRecord(self._logger, index)
+
+    def __iter__(self) -> Iterator[CompactCallRecord]:
+        for call_id in range(len(self)):
+            yield CompactCallRecord(self._logger, call_id)
+
+
+class CompactAccessTimes(MutableMapping[Tuple[str, int], int]):
+    """
+    A mapping from (array_name, index) to access time, backed by one of the
+    per-array time columns of a :py:class:`CompactAccessLogger`.
+    """
+
+    def __init__(
+        self, logger: CompactAccessLogger, times: List["array[int]"]
+    ) -> None:
+        self._logger = logger
+        self._times = times
+
+    def __getitem__(self, key: Tuple[str, int]) -> int:
+        array_name, index = key
+        array_id = self._logger._array_ids.get(array_name)
+        if array_id is None or not 0 <= index < len(self._times[array_id]):
+            raise KeyError(key)
+        time = self._times[array_id][index]
+        if time < 0:
+            raise KeyError(key)
+        return time
+
+    def __setitem__(self, key: Tuple[str, int], time: int) -> None:
+        array_name, index = key
+        if index < 0:
+            raise ValueError("Array indices must be non-negative.")
+        if time < 0:
+            raise ValueError("Access times must be non-negative.")
+        array_id = self._logger.intern(array_name)
+        if index >= len(self._times[array_id]):
+            self._logger._grow_times(array_id, index)
+        self._times[array_id][index] = time
+
+    def __delitem__(self, key: Tuple[str, int]) -> None:
+        if key not in self:
+            raise KeyError(key)
+        array_name, index = key
+        self._times[self._logger._array_ids[array_name]][index] = -1
+
+    def __iter__(self) -> Iterator[Tuple[str, int]]:
+        for array_id, times in enumerate(self._times):
+            array_name = self._logger.array_name(array_id)
+            for index, time in enumerate(times):
+                if time >= 0:
+                    yield (array_name, index)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
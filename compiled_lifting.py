@@ -0,0 +1,215 @@
+"""
+Pure-Python lifting filter kernels, specialised ('compiled') for a particular
+:py:class:`LiftingStage` and signal length.
+
+Interpreting a :py:class:`LiftingStage` afresh for every value computed is
+slow: the stage must be unpacked, the position of each tap computed and
+clamped to the edges of the signal and the lift type inspected. Instead,
+:py:func:`compile_stage` generates Python source code for the stage with its
+taps unrolled and all constants (including the signal edges) baked in. A
+clamp-free code path is used for the interior of the signal, with clamping
+applied only to the few values near each edge.
+
+Compiled kernels are cached so each (stage, length) combination is only
+compiled once.
+"""
+
+from typing import (
+    List,
+    Dict,
+    Callable,
+    Any,
+    Generator,
+    Tuple,
+    Sequence,
+    NamedTuple,
+)
+
+from functools import lru_cache
+
+from vc2_wavelet_definitions import (
+    WaveletFilters,
+    LiftingFilterTypes,
+    LiftingStage,
+    ANALYSIS_FILTERS,
+    SYNTHESIS_FILTERS,
+)
+
+
+class CompiledStage(NamedTuple):
+    """
+    The kernels generated for a particular lifting stage and signal length.
+    """
+
+    compute_value: Callable[[Any, int], int]
+    """
+    compute_value(source, index) -> int
+
+    Compute a single output value, indexing the source (any indexable object,
+    e.g. a :py:class:`~logging_lazy_lists.LoggingLazyList`) for each input
+    value required, in exactly the same order as
+    :py:meth:`LiftedLLL.compute_value
+    <logging_lazy_lists.LiftedLLL.compute_value>`.
+    """
+
+    compute_value_steps: Callable[
+        [Any, int], Generator[Tuple[Any, int], Any, int]
+    ]
+    """
+    compute_value_steps(source, index) -> generator
+
+    A generator version of compute_value which yields (source, index) tuples
+    rather than indexing the source directly (see
+    :py:meth:`~logging_lazy_lists.LoggingLazyList.compute_value_steps`).
+    """
+
+    lift: Callable[[Sequence[int]], List[int]]
+    """
+    lift(values) -> list
+
+    Apply the lifting stage to a complete list of values.
+    """
+
+    source: str
+    """The generated Python source code (useful for debugging)."""
+
+
+def _generate_source(stage: LiftingStage, length: int) -> str:
+    lift_type, S, L, D, taps = stage
+
+    offsets = [(2 * i) - 1 for i in range(D, L + D)]
+    parity = 0 if lift_type.update_even else 1
+    lo = 1 if lift_type.update_even else 0
+    hi = length - (1 if lift_type.update_even else 2)
+    op = "+" if lift_type.add else "-"
+
+    # The range of (updated) indices for which no tap needs clamping
+    interior_start = max(0, lo - min(offsets))
+    interior_start += (interior_start - parity) % 2
+    interior_end = min(length - 1, hi - max(offsets))
+    interior_end -= (interior_end - parity) % 2
+    interior_stop = max(interior_start, interior_end + 2)
+
+    left_edge = list(range(parity, min(interior_start, length), 2))
+    right_edge = list(range(max(interior_stop, parity), length, 2))
+
+    def weighted_sum(access: Callable[[int], str]) -> str:
+        return " + ".join(
+            f"({tap} * {access(offset)})" for tap, offset in zip(taps, offsets)
+        )
+
+    def clamped(offset: int) -> str:
+        return f"max(min(index + {offset}, {hi}), {lo})"
+
+    def unclamped(offset: int) -> str:
+        return f"index + {offset}"
+
+    def rounded(expr: str) -> str:
+        return f"((({expr}) + {1 << (S - 1)}) >> {S})" if S > 0 else f"({expr})"
+
+    def call(position: Callable[[int], str]) -> Callable[[int], str]:
+        return lambda offset: f"source[{position(offset)}]"
+
+    def step(position: Callable[[int], str]) -> Callable[[int], str]:
+        return lambda offset: f"(yield (source, {position(offset)}))"
+
+    def slice_(offset: int) -> str:
+        return f"x[{interior_start + offset}:{interior_stop + offset}:2]"
+
+    return f"""
+def compute_value(source, index):
+    if index % 2 != {parity}:
+        return source[index]
+    if {interior_start} <= index < {interior_stop}:
+        s = {weighted_sum(call(unclamped))}
+    else:
+        s = {weighted_sum(call(clamped))}
+    return source[index] {op} {rounded("s")}
+
+def compute_value_steps(source, index):
+    if index % 2 != {parity}:
+        return (yield (source, index))
+    if {interior_start} <= index < {interior_stop}:
+        s = {weighted_sum(step(unclamped))}
+    else:
+        s = {weighted_sum(step(clamped))}
+    return (yield (source, index)) {op} {rounded("s")}
+
+def lift(x):
+    if len(x) != {length}:
+        raise ValueError("Kernel compiled for length {length}, not %d." % len(x))
+    out = list(x)
+    source = x
+    for index in {left_edge + right_edge}:
+        s = {weighted_sum(call(clamped))}
+        out[index] = source[index] {op} {rounded("s")}
+    out[{interior_start}:{interior_stop}:2] = [
+        c {op} {rounded(weighted_sum(lambda offset: f"v{offsets.index(offset)}"))}
+        for (c, {", ".join(f"v{i}" for i in range(L))}) in zip(
+            {slice_(0)}, {", ".join(slice_(offset) for offset in offsets)}
+        )
+    ]
+    return out
+"""
+
+
+@lru_cache(maxsize=256)
+def _compile(
+    lift_type: LiftingFilterTypes,
+    S: int,
+    L: int,
+    D: int,
+    taps: Tuple[int, ...],
+    length: int,
+) -> CompiledStage:
+    stage = LiftingStage(LiftingFilterTypes(lift_type), S, L, D, list(taps))
+    source = _generate_source(stage, length)
+    namespace: Dict[str, Any] = {}
+    filename = f"<lifting kernel {stage} length={length}>"
+    exec(compile(source, filename, "exec"), namespace)
+    return CompiledStage(
+        namespace["compute_value"],
+        namespace["compute_value_steps"],
+        namespace["lift"],
+        source,
+    )
+
+
+def compile_stage(stage: LiftingStage, length: int) -> CompiledStage:
+    """
+    Get the (cached) compiled kernels for a lifting stage applied to a signal
+    of the specified length.
+    """
+    lift_type, S, L, D, taps = stage
+    return _compile(lift_type, S, L, D, tuple(taps), length)
+
+
+def lift(values: Sequence[int], stage: LiftingStage) -> List[int]:
+    """Apply a single lifting stage to a list of values."""
+    return compile_stage(stage, len(values)).lift(values)
+
+
+def apply_lifting_stages(
+    values: Sequence[int], stages: List[LiftingStage]
+) -> List[int]:
+    """Apply a series of lifting stages, one after another, to a list."""
+    out = list(values)
+    for stage in stages:
+        out = lift(out, stage)
+    return out
+
+
+def analyse(values: Sequence[int], wavelet: WaveletFilters) -> List[int]:
+    """
+    Perform a single-level wavelet analysis (encode), returning the
+    interleaved low- and high-pass coefficients.
+    """
+    return apply_lifting_stages(values, ANALYSIS_FILTERS[wavelet])
+
+
+def synthesise(values: Sequence[int], wavelet: WaveletFilters) -> List[int]:
+    """
+    Perform a single-level wavelet synthesis (decode) of interleaved low- and
+    high-pass coefficients.
+    """
+    return apply_lifting_stages(values, SYNTHESIS_FILTERS[wavelet])
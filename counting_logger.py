@@ -0,0 +1,144 @@
+"""
+Low-overhead alternatives to full tracing with an
+:py:class:`~logging_lazy_lists.AccessLogger`.
+
+Loggers come in three tiers of increasing cost:
+
+* :py:class:`NullLogger` records nothing. Lists skip all logging, so values
+  are computed with no per-access bookkeeping at all.
+* :py:class:`CountingLogger` maintains a handful of
+  :py:class:`~logging_lazy_lists.ArrayCounters` per array: accesses, cache
+  hits, computations and the time spent computing values. This is cheap
+  enough to use on full-sized signals to find the most expensive stages (see
+  :py:func:`format_report`).
+* :py:class:`~logging_lazy_lists.AccessLogger` (and
+  :py:class:`~compact_access_logger.CompactAccessLogger`) record every call
+  and access, as required for animation.
+
+Run this module as a script to profile a wavelet and evaluation order.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import random
+
+from argparse import ArgumentParser
+
+from logging_lazy_lists import AccessLogger, ArrayCounters
+
+from vc2_wavelet_definitions import WaveletFilters
+
+from streaming_wavelet_toy import ORDERS, construct_all_arrays, parse_wavelet
+
+
+class NullLogger(AccessLogger):
+    """An :py:class:`AccessLogger` which records nothing."""
+
+    traced = False
+
+    def begin_call(self, array_name: str, index: int) -> Any:
+        return None
+
+    def end_call(self, call: Any) -> None:
+        pass
+
+    def begin_access(self, array_name: str, index: int) -> Any:
+        return None
+
+    def end_access(self, access: Any) -> None:
+        pass
+
+
+class CountingLogger(NullLogger):
+    """
+    An untraced logger which counts the accesses and computations made in
+    each array and times the computations.
+    """
+
+    counters: Dict[str, ArrayCounters]
+    """The counters for each array, in the order the arrays were created."""
+
+    _nesting: List[int]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.counters = {}
+        self._nesting = []
+
+    def array_counters(self, array_name: str) -> Optional[ArrayCounters]:
+        counters = self.counters.get(array_name)
+        if counters is None:
+            counters = self.counters[array_name] = ArrayCounters(self._nesting)
+        return counters
+
+
+def format_report(logger: CountingLogger) -> str:
+    """Produce a human readable summary of the counts in a CountingLogger."""
+    name_col_width = max((len(name) for name in logger.counters), default=5) + 1
+    total_ns = sum(counters.self_ns for counters in logger.counters.values())
+
+    out = ""
+    out += f"{'Array':<{name_col_width}s}"
+    out += "   Accesses       Hits  Computed   Self ms  Total ms  Self %\n"
+    for name, counters in logger.counters.items():
+        out += f"{name:<{name_col_width}s}"
+        out += f" {counters.accesses:10d}"
+        out += f" {counters.hits:10d}"
+        out += f" {counters.computations:9d}"
+        out += f" {counters.self_ns / 1e6:9.2f}"
+        out += f" {counters.total_ns / 1e6:9.2f}"
+        out += f" {100 * counters.self_ns / total_ns if total_ns else 0.0:6.1f}\n"
+    return out
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="""
+            Count the accesses and computations made in each array of a
+            wavelet transform evaluated in a particular order, along with the
+            time spent computing each array.
+        """
+    )
+    parser.add_argument(
+        "--wavelet",
+        "-w",
+        default=WaveletFilters.le_gall_5_3.name,
+        choices=(
+            [str(f.value) for f in WaveletFilters] + [f.name for f in WaveletFilters]
+        ),
+        help="Wavelet transform to profile. Default: %(default)s.",
+    )
+    parser.add_argument(
+        "--order",
+        "-o",
+        choices=list(ORDERS),
+        default="block",
+        help="Computation order. Default: %(default)s.",
+    )
+    parser.add_argument(
+        "--num-values",
+        "-n",
+        type=int,
+        default=100000,
+        help="Length of signal. Default: %(default)s.",
+    )
+    parser.add_argument(
+        "--page-size",
+        "-p",
+        type=int,
+        default=1,
+        help="Number of values computed together. Default: %(default)s.",
+    )
+    args = parser.parse_args()
+
+    wavelet = parse_wavelet(args.wavelet)
+    logger = CountingLogger()
+    arrays = construct_all_arrays(
+        [random.randrange(100) for _ in range(args.num_values)],
+        wavelet,
+        logger,
+        args.page_size,
+    )
+    ORDERS[args.order](arrays, wavelet)
+
+    print(format_report(logger), end="")
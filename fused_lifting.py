@@ -0,0 +1,306 @@
+"""
+A fused, cache-friendly implementation of chains of lifting stages.
+
+Applying lifting stages one at a time (as :py:mod:`numpy_lifting` does) makes
+a complete pass over the signal for every stage. Once signals no longer fit
+in the CPU's caches, every pass reads and writes main memory, so a Daubechies
+9/7 round trip (eight stages) moves the signal to and from memory eight times.
+
+Here, instead, the signal is pushed through every stage in small blocks. Each
+stage (:py:class:`FusedLiftingStage`) computes as many outputs as its inputs
+so far allow and retains only the few trailing inputs it still needs (see
+:py:mod:`lifting_analysis`), passing its outputs straight on to the next
+stage while they are still in cache. Each input sample is therefore read from
+main memory once and each output written once, regardless of the number of
+stages.
+
+The results are bit-for-bit identical to :py:mod:`numpy_lifting`, including
+the choice of output dtype.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+
+from vc2_wavelet_definitions import (
+    WaveletFilters,
+    LiftingStage,
+    ANALYSIS_FILTERS,
+    SYNTHESIS_FILTERS,
+)
+
+from lifting_analysis import (
+    SignalRange,
+    bit_depth_range,
+    inputs_required,
+    lowest_input,
+    signal_value_range,
+    stage_ranges,
+    tap_offsets,
+)
+
+from numpy_lifting import (
+    ArrayLike,
+    analysis_range,
+    dtype_range,
+    output_dtype,
+    stage_dtypes,
+)
+
+
+class FusedLiftingStage:
+    """
+    A lifting stage which consumes its input in blocks, producing output
+    samples as soon as they can be computed.
+
+    Blocks are fed in using :py:meth:`push` and the end of the signal
+    signalled using :py:meth:`flush`. Both return a (possibly empty) array of
+    output samples.
+    """
+
+    stage: LiftingStage
+
+    output_range: SignalRange
+    """The worst-case range of the output samples."""
+
+    _out_dtype: np.dtype
+    _acc_dtype: np.dtype
+
+    _lookbehind: int
+    """
+    How far before the next output sample the lowest input sample it (or any
+    later output) reads may be.
+    """
+
+    _buffer: np.ndarray
+    """The retained input samples."""
+
+    _offset: int
+    """The index (in the input) of the first sample in _buffer."""
+
+    _emitted: int
+    """Number of output samples produced so far."""
+
+    def __init__(self, stage: LiftingStage, input_range: SignalRange) -> None:
+        self.stage = stage
+        self.output_range = stage_ranges(stage, input_range).output
+        self._out_dtype, self._acc_dtype = stage_dtypes(stage, input_range)
+
+        reach = max(abs(offset) for offset in tap_offsets(stage)) + 2
+        self._lookbehind = max(
+            n - lowest_input(stage, n) for n in range(2 * reach, 2 * reach + 2)
+        )
+
+        self._buffer = np.zeros(0, dtype=self._out_dtype)
+        self._offset = 0
+        self._emitted = 0
+
+    @property
+    def _received(self) -> int:
+        return self._offset + len(self._buffer)
+
+    def push(self, block: np.ndarray) -> np.ndarray:
+        """
+        Add the next block of input samples. Returns the output samples which
+        have become available.
+        """
+        if len(block):
+            self._buffer = np.concatenate((self._buffer, block))
+
+        # Find the last output sample which can be computed. (NB: The inputs
+        # required by each output grow monotonically with each parity so only
+        # the last output of each parity needs checking.)
+        received = self._received
+        stop = received
+        while stop > self._emitted and not all(
+            inputs_required(self.stage, n) <= received
+            for n in range(max(self._emitted, stop - 2), stop)
+        ):
+            stop -= 1
+
+        return self._emit(stop, None)
+
+    def flush(self) -> np.ndarray:
+        """
+        Signal the end of the signal. Returns all remaining output samples.
+        """
+        length = self._received
+        hi = length - (1 if self.stage.lift_type.update_even else 2)
+        return self._emit(length, hi)
+
+    def _emit(self, stop: int, hi: Optional[int]) -> np.ndarray:
+        """
+        Compute the outputs from _emitted up to 'stop', then discard the
+        inputs which are no longer required. If the length of the signal is
+        known, 'hi' gives the index which taps are clamped to at its end.
+        """
+        lift_type, S, L, D, taps = self.stage
+        start = self._emitted
+        offset = self._offset
+        buffer = self._buffer
+
+        out = buffer[start - offset : stop - offset].astype(self._out_dtype)
+
+        parity = 0 if lift_type.update_even else 1
+        first = start + ((parity - start) % 2)
+        count = len(range(first, stop, 2))
+        if count:
+            lo = 1 if lift_type.update_even else 0
+            acc = np.zeros(count, dtype=self._acc_dtype)
+            for tap, tap_offset in zip(taps, tap_offsets(self.stage)):
+                first_pos = first + tap_offset
+                last_pos = first_pos + (2 * (count - 1))
+                if first_pos >= lo and (hi is None or last_pos <= hi):
+                    # Fast path: no clamping required
+                    values = buffer[first_pos - offset : last_pos - offset + 1 : 2]
+                else:
+                    positions = np.arange(first_pos, last_pos + 1, 2)
+                    if hi is not None:
+                        positions = np.clip(positions, lo, hi)
+                    else:
+                        positions = np.maximum(positions, lo)
+                    values = buffer[positions - offset]
+                acc += tap * values.astype(self._acc_dtype)
+            if S > 0:
+                acc += 1 << (S - 1)
+            acc >>= S
+
+            work_dtype = np.promote_types(self._out_dtype, self._acc_dtype)
+            work = out[first - start :: 2].astype(work_dtype)
+            if lift_type.add:
+                out[first - start :: 2] = work + acc
+            else:
+                out[first - start :: 2] = work - acc
+
+        self._emitted = stop
+        keep_from = max(offset, stop - self._lookbehind)
+        self._buffer = buffer[keep_from - offset :]
+        self._offset = keep_from
+
+        return out
+
+
+class FusedLiftingChain:
+    """
+    A chain of :py:class:`FusedLiftingStage`\\s, each feeding its outputs
+    directly into the next.
+    """
+
+    stages: List[FusedLiftingStage]
+
+    output_dtype: np.dtype
+    """The dtype of the output samples produced."""
+
+    def __init__(
+        self, lifting_stages: List[LiftingStage], input_range: SignalRange
+    ) -> None:
+        self.stages = []
+        for stage in lifting_stages:
+            self.stages.append(FusedLiftingStage(stage, input_range))
+            input_range = self.stages[-1].output_range
+        self.output_dtype = output_dtype([], input_range)
+
+    def push(self, block: np.ndarray) -> np.ndarray:
+        """
+        Add the next block of input samples. Returns the output samples which
+        have become available.
+        """
+        for stage in self.stages:
+            block = stage.push(block)
+        return block.astype(self.output_dtype, copy=False)
+
+    def flush(self) -> np.ndarray:
+        """
+        Signal the end of the signal. Returns all remaining output samples.
+        """
+        block = np.zeros(0, dtype=self.output_dtype)
+        for stage in self.stages:
+            block = np.concatenate((stage.push(block), stage.flush()))
+        return block.astype(self.output_dtype, copy=False)
+
+
+def fused_lifting(
+    values: ArrayLike,
+    stages: List[LiftingStage],
+    block_size: int = 1 << 14,
+    input_range: Optional[SignalRange] = None,
+) -> np.ndarray:
+    """
+    Apply a chain of lifting stages to a (1D) signal in a single pass,
+    'block_size' samples at a time. See
+    :py:func:`numpy_lifting.apply_lifting_stages` for 'input_range'.
+    """
+    values = np.asarray(values)
+    check_range = input_range is not None
+    if input_range is None:
+        input_range = dtype_range(values.dtype)
+    lo, hi = signal_value_range(input_range)
+
+    chain = FusedLiftingChain(stages, input_range)
+    out = np.empty(len(values), dtype=chain.output_dtype)
+
+    emitted = 0
+    for start in range(0, len(values), block_size):
+        block = values[start : start + block_size]
+        if check_range and (block.min() < lo or block.max() > hi):
+            raise ValueError(f"Input values outside of the range {lo} to {hi}.")
+        block = chain.push(block)
+        out[emitted : emitted + len(block)] = block
+        emitted += len(block)
+    out[emitted:] = chain.flush()
+
+    return out
+
+
+def fused_analyse(
+    values: ArrayLike,
+    wavelet: WaveletFilters,
+    block_size: int = 1 << 14,
+    bit_depth: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Perform a single-level wavelet analysis (encode) in a single pass. See
+    :py:func:`numpy_lifting.analyse`.
+    """
+    return fused_lifting(
+        values,
+        ANALYSIS_FILTERS[wavelet],
+        block_size,
+        bit_depth_range(bit_depth) if bit_depth is not None else None,
+    )
+
+
+def fused_synthesise(
+    values: ArrayLike,
+    wavelet: WaveletFilters,
+    block_size: int = 1 << 14,
+    bit_depth: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Perform a single-level wavelet synthesis (decode) in a single pass. See
+    :py:func:`numpy_lifting.synthesise`.
+    """
+    return fused_lifting(
+        values,
+        SYNTHESIS_FILTERS[wavelet],
+        block_size,
+        analysis_range(wavelet, bit_depth) if bit_depth is not None else None,
+    )
+
+
+def fused_analyse_then_synthesise(
+    values: ArrayLike,
+    wavelet: WaveletFilters,
+    block_size: int = 1 << 14,
+    bit_depth: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Encode and then decode a signal, passing it through every analysis and
+    synthesis stage in a single pass.
+    """
+    return fused_lifting(
+        values,
+        ANALYSIS_FILTERS[wavelet] + SYNTHESIS_FILTERS[wavelet],
+        block_size,
+        bit_depth_range(bit_depth) if bit_depth is not None else None,
+    )
@@ -0,0 +1,422 @@
+"""
+Analytic calculation of the dependencies, latency and buffering requirements
+of chains of lifting stages.
+
+Everything here is derived directly from the parameters of each
+:py:class:`LiftingStage` (its type, 'L' and 'D') without computing any
+values. All quantities assume the lifting stages are implemented as streaming
+filters, as in :py:mod:`streaming_lifting`: samples arrive one at a time,
+outputs are produced in order and the length of the stream is not known until
+it ends.
+
+* :py:func:`stage_support` and :py:func:`chain_support` give the input
+  samples each output sample depends on.
+* :py:func:`inputs_required` and :py:func:`chain_inputs_required` give the
+  number of input samples which must have been received before a given
+  output sample can be produced, and :py:func:`lowest_input` the earliest
+  input sample it may read.
+* :py:func:`stage_delay` and :py:func:`chain_latency` give the worst-case
+  number of input samples which must be received after input sample 'n'
+  before output sample 'n' can be produced.
+* :py:func:`stage_buffer_length` gives the minimum size of the ring buffer a
+  streaming stage requires.
+* :py:func:`stage_ranges` and :py:func:`chain_ranges` give the worst-case
+  range of values produced by each stage given the range of its inputs (e.g.
+  from :py:func:`bit_depth_range`), and :py:func:`bits_required` the number
+  of bits needed to store them.
+
+Run this module as a script to print a report for each wavelet.
+"""
+
+from typing import List, Tuple, NamedTuple
+
+from functools import lru_cache
+
+from argparse import ArgumentParser
+
+from vc2_wavelet_definitions import (
+    WaveletFilters,
+    LiftingStage,
+    LiftingFilterTypes,
+    ANALYSIS_FILTERS,
+    SYNTHESIS_FILTERS,
+)
+
+
+Support = Tuple[Tuple[int, ...], Tuple[int, ...]]
+"""
+The (sorted) offsets of the input samples on which (even, odd) output
+samples depend, relative to the output sample's index.
+"""
+
+
+def tap_offsets(stage: LiftingStage) -> List[int]:
+    """
+    The offsets of each filter tap relative to the sample being updated.
+    """
+    lift_type, S, L, D, taps = stage
+    return [(2 * i) - 1 for i in range(D, L + D)]
+
+
+def _updates(stage: LiftingStage, index: int) -> bool:
+    return stage.lift_type.update_even == ((index % 2) == 0)
+
+
+def stage_support(stage: LiftingStage) -> Support:
+    """
+    The input samples each output of a single lifting stage depends on (away
+    from the signal edges).
+    """
+    updated = tuple(sorted({0, *tap_offsets(stage)}))
+    if stage.lift_type.update_even:
+        return (updated, (0,))
+    else:
+        return ((0,), updated)
+
+
+def chain_support(stages: List[LiftingStage]) -> Support:
+    """
+    The input samples each output of a chain of lifting stages depends on
+    (away from the signal edges).
+    """
+    support: Support = ((0,), (0,))
+    for stage in stages:
+        # Each output of this stage depends on the stage's inputs which in
+        # turn depend on the chain's inputs
+        stage_even, stage_odd = stage_support(stage)
+        support = (
+            tuple(sorted({a + b for a in stage_even for b in support[a % 2]})),
+            tuple(sorted({a + b for a in stage_odd for b in support[(1 + a) % 2]})),
+        )
+    return support
+
+
+def inputs_required(stage: LiftingStage, index: int) -> int:
+    """
+    The number of input samples which must have been received before output
+    sample 'index' of a lifting stage can be computed.
+
+    This accounts for the clamping of filter taps at the start of the signal
+    and the fact that the end of the stream must be ruled out before a tap
+    can be known not to be clamped at the end of the signal.
+    """
+    if not _updates(stage, index):
+        return index + 1
+
+    update_even = stage.lift_type.update_even
+    lo = 1 if update_even else 0
+    last_tap = max(max(index + offset, lo) for offset in tap_offsets(stage))
+    if last_tap <= index:
+        return index + 1
+    elif update_even:
+        # Taps clamp to the final sample (i.e. length - 1)
+        return last_tap + 1
+    else:
+        # Taps clamp to the penultimate sample (i.e. length - 2) so one more
+        # sample must be received to rule out the end of the stream.
+        return last_tap + 2
+
+
+def lowest_input(stage: LiftingStage, index: int) -> int:
+    """
+    The lowest input index which may be read to compute output sample
+    'index' (including at the ends of the signal).
+    """
+    if not _updates(stage, index):
+        return index
+
+    update_even = stage.lift_type.update_even
+    lo = 1 if update_even else 0
+    offsets = tap_offsets(stage)
+    lowest = min(index, *(max(index + offset, lo) for offset in offsets))
+    if not update_even and max(offsets) > 0:
+        # At the end of the signal, taps may be clamped to the penultimate
+        # sample, which may be the one before this one
+        lowest = min(lowest, index - 1)
+    return max(0, lowest)
+
+
+def _transient_length(stages: List[LiftingStage]) -> int:
+    """
+    An (even) number of output samples after which the start of the signal no
+    longer affects the chain's behaviour (i.e. behaviour becomes periodic).
+    """
+    reach = sum(
+        max(abs(offset) for offset in tap_offsets(stage)) + 2 for stage in stages
+    )
+    return 2 * (reach + 2)
+
+
+def chain_inputs_required(stages: List[LiftingStage], index: int) -> int:
+    """
+    The number of input samples which must have been received before output
+    sample 'index' of a chain of lifting stages can be produced (along with
+    all output samples before it).
+    """
+    required = index + 1
+    for stage in reversed(stages):
+        # NB: Outputs are produced in order so every earlier output's
+        # requirements must be met too
+        required = max(inputs_required(stage, n) for n in range(required))
+    return required
+
+
+@lru_cache(maxsize=None)
+def _chain_latency(
+    stages: Tuple[Tuple[LiftingFilterTypes, int, int, int, Tuple[int, ...]], ...]
+) -> int:
+    chain = [LiftingStage(t, S, L, D, list(taps)) for t, S, L, D, taps in stages]
+    return max(
+        chain_inputs_required(chain, n) - (n + 1)
+        for n in range(_transient_length(chain))
+    )
+
+
+def chain_latency(stages: List[LiftingStage]) -> int:
+    """
+    The number of input samples which must be received after input sample
+    'n' before output sample 'n' of a chain of lifting stages can be produced
+    in the worst case.
+
+    This is often smaller than the sum of each stage's
+    :py:func:`stage_delay` since the odd and even samples of a stage
+    may have different delays.
+    """
+    return _chain_latency(
+        tuple(
+            (lift_type, S, L, D, tuple(taps))
+            for lift_type, S, L, D, taps in stages
+        )
+    )
+
+
+def stage_delay(stage: LiftingStage) -> int:
+    """
+    The number of input samples which must be received after input sample
+    'n' before output sample 'n' of a single lifting stage can be produced,
+    in the worst case.
+    """
+    return chain_latency([stage])
+
+
+def stage_buffer_length(stage: LiftingStage) -> int:
+    """
+    The minimum number of input samples a streaming implementation of a
+    lifting stage must retain.
+
+    When output sample 'n' is produced, every input sample from the lowest
+    one still needed by output 'n' or any later output, up to the most
+    recently received, must be available.
+    """
+    count = _transient_length([stage])
+    window = 2 * max(abs(offset) for offset in tap_offsets(stage)) + 4
+    required = 0
+    length = 1
+    for n in range(count):
+        required = max(required, inputs_required(stage, n))
+        lowest = min(lowest_input(stage, m) for m in range(n, n + window))
+        length = max(length, required - lowest)
+    return length
+
+
+ValueRange = Tuple[int, int]
+"""An inclusive (minimum, maximum) range of integer values."""
+
+SignalRange = Tuple[ValueRange, ValueRange]
+"""The ranges of the (even, odd) samples of a signal."""
+
+
+def bit_depth_range(bit_depth: int) -> SignalRange:
+    """
+    The range of a signal of signed (two's complement) samples with the
+    specified bit depth.
+    """
+    value_range = (-(1 << (bit_depth - 1)), (1 << (bit_depth - 1)) - 1)
+    return (value_range, value_range)
+
+
+def signal_value_range(signal_range: SignalRange) -> ValueRange:
+    """The range of all (even and odd) samples in a signal."""
+    (even_lo, even_hi), (odd_lo, odd_hi) = signal_range
+    return (min(even_lo, odd_lo), max(even_hi, odd_hi))
+
+
+def bits_required(value_range: ValueRange) -> int:
+    """
+    The number of bits needed to store any value in the range as a signed
+    (two's complement) integer.
+    """
+    lo, hi = value_range
+    return max((-lo - 1).bit_length(), hi.bit_length()) + 1
+
+
+def _scale(tap: int, value_range: ValueRange) -> ValueRange:
+    lo, hi = tap * value_range[0], tap * value_range[1]
+    return (min(lo, hi), max(lo, hi))
+
+
+class StageRanges(NamedTuple):
+    """The worst-case ranges of the values computed by a lifting stage."""
+
+    output: SignalRange
+    """The range of the (even, odd) samples output."""
+
+    accumulator: ValueRange
+    """
+    A range containing every intermediate value of the filter's accumulator:
+    each tap's product, every partial sum of these and the sum after the
+    rounding offset is added.
+    """
+
+
+def stage_ranges(stage: LiftingStage, input_range: SignalRange) -> StageRanges:
+    """
+    Compute the worst-case range of values produced by a lifting stage using
+    interval arithmetic.
+
+    The filter taps always read samples of the opposite parity to the sample
+    being updated (including at the edges of the signal) and so the ranges of
+    even and odd samples are tracked separately.
+    """
+    lift_type, S, L, D, taps = stage
+    update_even = lift_type.update_even
+    updated_range = input_range[0 if update_even else 1]
+    tap_range = input_range[1 if update_even else 0]
+
+    products = [_scale(tap, tap_range) for tap in taps]
+    rounding = (1 << (S - 1)) if S > 0 else 0
+    total = (
+        sum(lo for lo, hi in products) + rounding,
+        sum(hi for lo, hi in products) + rounding,
+    )
+    accumulator = (
+        min(0, sum(min(0, lo) for lo, hi in products)),
+        max(0, sum(max(0, hi) for lo, hi in products) + rounding),
+    )
+
+    # NB: Shifting is monotonic so the bounds may be shifted directly
+    shifted = (total[0] >> S, total[1] >> S)
+    if lift_type.add:
+        updated = (updated_range[0] + shifted[0], updated_range[1] + shifted[1])
+    else:
+        updated = (updated_range[0] - shifted[1], updated_range[1] - shifted[0])
+
+    if update_even:
+        return StageRanges((updated, tap_range), accumulator)
+    else:
+        return StageRanges((tap_range, updated), accumulator)
+
+
+def chain_ranges(
+    stages: List[LiftingStage], input_range: SignalRange
+) -> List[StageRanges]:
+    """
+    Compute the worst-case range of the values produced by each stage in a
+    chain of lifting stages.
+    """
+    out = []
+    for stage in stages:
+        out.append(stage_ranges(stage, input_range))
+        input_range = out[-1].output
+    return out
+
+
+class ChainAnalysis(NamedTuple):
+    """Summary of the analytic properties of a chain of lifting stages."""
+
+    support: Support
+    """The input samples each (even, odd) output depends on."""
+
+    stage_delays: List[int]
+    """The delay of each stage (see :py:func:`stage_delay`)."""
+
+    latency: int
+    """The end-to-end latency (see :py:func:`chain_latency`)."""
+
+    stage_buffer_lengths: List[int]
+    """The minimum buffer length of each stage."""
+
+    @property
+    def buffer_length(self) -> int:
+        """The total number of samples buffered by all stages."""
+        return sum(self.stage_buffer_lengths)
+
+
+def analyse_chain(stages: List[LiftingStage]) -> ChainAnalysis:
+    """Compute all of the analytic properties of a chain of lifting stages."""
+    return ChainAnalysis(
+        support=chain_support(stages),
+        stage_delays=[stage_delay(stage) for stage in stages],
+        latency=chain_latency(stages),
+        stage_buffer_lengths=[stage_buffer_length(stage) for stage in stages],
+    )
+
+
+def format_report(wavelet: WaveletFilters, bit_depth: int = 10) -> str:
+    """
+    Produce a human readable report on a wavelet's lifting chains. Value
+    ranges are reported for an (analysis) input signal of the specified bit
+    depth.
+    """
+    input_range = bit_depth_range(bit_depth)
+    analysis_ranges = chain_ranges(ANALYSIS_FILTERS[wavelet], input_range)
+    coefficient_range = analysis_ranges[-1].output
+
+    out = f"{wavelet.name}:\n"
+    for name, stages, ranges in [
+        ("analysis", ANALYSIS_FILTERS[wavelet], analysis_ranges),
+        (
+            "synthesis",
+            SYNTHESIS_FILTERS[wavelet],
+            chain_ranges(SYNTHESIS_FILTERS[wavelet], coefficient_range),
+        ),
+        (
+            "analysis+synthesis",
+            ANALYSIS_FILTERS[wavelet] + SYNTHESIS_FILTERS[wavelet],
+            chain_ranges(
+                ANALYSIS_FILTERS[wavelet] + SYNTHESIS_FILTERS[wavelet], input_range
+            ),
+        ),
+    ]:
+        analysis = analyse_chain(stages)
+        even, odd = analysis.support
+        out += f"  {name}:\n"
+        out += f"    even output support: {min(even)} to {max(even)}\n"
+        out += f"    odd output support: {min(odd)} to {max(odd)}\n"
+        out += f"    stage delays: {analysis.stage_delays}\n"
+        out += f"    latency: {analysis.latency}\n"
+        out += f"    stage buffer lengths: {analysis.stage_buffer_lengths}\n"
+        out += f"    total buffer length: {analysis.buffer_length}\n"
+        output_bits = [bits_required(signal_value_range(r.output)) for r in ranges]
+        accumulator_bits = [bits_required(r.accumulator) for r in ranges]
+        out += f"    stage output bits: {output_bits}\n"
+        out += f"    stage accumulator bits: {accumulator_bits}\n"
+    return out
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Report the dependencies, latency and buffering of wavelets."
+    )
+    parser.add_argument(
+        "--wavelet",
+        "-w",
+        action="append",
+        choices=[f.name for f in WaveletFilters],
+        help="Wavelet to report on (may be given several times). Default: all.",
+    )
+    parser.add_argument(
+        "--bit-depth",
+        "-b",
+        type=int,
+        default=10,
+        help="Bit depth of the (signed) input signal. Default: %(default)s.",
+    )
+    args = parser.parse_args()
+
+    for wavelet in (
+        [WaveletFilters[name] for name in args.wavelet]
+        if args.wavelet
+        else WaveletFilters
+    ):
+        print(format_report(wavelet, args.bit_depth))
@@ -0,0 +1,211 @@
+"""
+Live-set (working memory) analysis of logged traces.
+
+A value is considered 'live' from the time it is first accessed until the
+time it is last accessed (inclusive), i.e. while it is drawn with a solid
+border in the animation. The number of live values at any moment is the
+amount of storage an implementation following the same evaluation order must
+provide.
+
+:py:func:`analyse_live_set` sweeps over the first and last access times
+recorded by an :py:class:`~logging_lazy_lists.AccessLogger`, reporting the
+number of live values over time along with the peak live set, overall and for
+each array. It runs in O(n log n) time for a trace accessing 'n' values.
+
+Run this module as a script to report on the live set of a wavelet and
+evaluation order.
+"""
+
+from typing import List, Dict, Tuple, NamedTuple, Optional, Container
+
+import random
+
+from bisect import bisect_right
+
+from argparse import ArgumentParser
+
+from logging_lazy_lists import AccessLogger
+
+from compact_access_logger import CompactAccessLogger
+
+from vc2_wavelet_definitions import WaveletFilters
+
+from streaming_wavelet_toy import ORDERS, construct_all_arrays, parse_wavelet
+
+from trace_file import load_trace
+
+
+class LiveSetPeak(NamedTuple):
+    size: int
+    """The peak number of live values."""
+
+    time: int
+    """The first time at which the peak was reached (0 if never)."""
+
+
+class LiveSetAnalysis(NamedTuple):
+    times: List[int]
+    live_counts: List[int]
+    """
+    The number of live values over time, as a step function: from times[i]
+    until times[i + 1], live_counts[i] values are live.
+    """
+
+    peak: LiveSetPeak
+    """The peak live set size of all arrays combined."""
+
+    array_peaks: Dict[str, LiveSetPeak]
+    """The peak live set size of each array (considered alone)."""
+
+    def live_count_at(self, t: int) -> int:
+        """The number of values live at time t."""
+        i = bisect_right(self.times, t)
+        return self.live_counts[i - 1] if i > 0 else 0
+
+
+def live_intervals(logger: AccessLogger) -> List[Tuple[str, int, int]]:
+    """
+    Get the (array_name, first_access_time, last_access_time) of every value
+    accessed in a trace.
+    """
+    last_access_time = logger.last_access_time
+    return [
+        (array_name, first, last_access_time[(array_name, index)])
+        for (array_name, index), first in logger.first_access_time.items()
+    ]
+
+
+def analyse_live_set(
+    logger: AccessLogger, array_names: Optional[Container[str]] = None,
+) -> LiveSetAnalysis:
+    """
+    Perform a sweep-line analysis of the live set of a trace. If
+    'array_names' is given, only values in the named arrays are considered.
+    """
+    # Events are (time, delta, array_name): values become live at their first
+    # access and dead the moment after their last access.
+    events: List[Tuple[int, int, str]] = []
+    for array_name, first, last in live_intervals(logger):
+        if array_names is None or array_name in array_names:
+            events.append((first, 1, array_name))
+            events.append((last + 1, -1, array_name))
+    events.sort()
+
+    times: List[int] = []
+    live_counts: List[int] = []
+    peak = LiveSetPeak(0, 0)
+
+    array_counts: Dict[str, int] = {}
+    array_peaks: Dict[str, LiveSetPeak] = {}
+
+    count = 0
+    for i, (time, delta, array_name) in enumerate(events):
+        count += delta
+        array_count = array_counts[array_name] = (
+            array_counts.get(array_name, 0) + delta
+        )
+        if array_count > array_peaks.get(array_name, LiveSetPeak(0, 0)).size:
+            array_peaks[array_name] = LiveSetPeak(array_count, time)
+
+        # NB: Only record the count once all simultaneous events are applied
+        if i + 1 == len(events) or events[i + 1][0] != time:
+            if times and live_counts[-1] == count:
+                continue
+            times.append(time)
+            live_counts.append(count)
+            if count > peak.size:
+                peak = LiveSetPeak(count, time)
+
+    return LiveSetAnalysis(times, live_counts, peak, array_peaks)
+
+
+def format_report(
+    analysis: LiveSetAnalysis, array_names: List[str], timeline: bool = False,
+) -> str:
+    """Produce a human readable report of a live set analysis."""
+    name_col_width = max((len(name) for name in array_names), default=0) + 1
+    out = ""
+    out += f"{'Array':<{name_col_width}s} Peak  Time\n"
+    for name in array_names:
+        peak = analysis.array_peaks.get(name, LiveSetPeak(0, 0))
+        out += f"{name:<{name_col_width}s} {peak.size:4d}  {peak.time}\n"
+    out += f"{'Total':<{name_col_width}s} {analysis.peak.size:4d}  "
+    out += f"{analysis.peak.time}\n"
+    if timeline:
+        out += "\nTime  Live values\n"
+        for time, count in zip(analysis.times, analysis.live_counts):
+            out += f"{time:<5d} {count}\n"
+    return out
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="""
+            Report the live set (peak working memory) of a wavelet transform
+            evaluated in a particular order.
+        """
+    )
+    parser.add_argument(
+        "--wavelet",
+        "-w",
+        default=WaveletFilters.le_gall_5_3.name,
+        choices=(
+            [str(f.value) for f in WaveletFilters] + [f.name for f in WaveletFilters]
+        ),
+        help="Wavelet transform to analyse. Default: %(default)s.",
+    )
+    parser.add_argument(
+        "--order",
+        "-o",
+        choices=list(ORDERS),
+        default="block",
+        help="Computation order. Default: %(default)s.",
+    )
+    parser.add_argument(
+        "--num-values",
+        "-n",
+        type=int,
+        default=16,
+        help="Length of signal. Default: %(default)s.",
+    )
+    parser.add_argument(
+        "--logger",
+        "-l",
+        choices=["records", "compact"],
+        default="compact",
+        help="Access log storage. Default: %(default)s.",
+    )
+    parser.add_argument(
+        "--load-trace",
+        metavar="FILE",
+        help="""
+            Analyse a trace saved using streaming_wavelet_toy.py --save-trace
+            rather than computing a new one.
+        """,
+    )
+    parser.add_argument(
+        "--timeline",
+        action="store_true",
+        help="Also list the number of live values over time.",
+    )
+    args = parser.parse_args()
+
+    logger: AccessLogger
+    if args.load_trace is not None:
+        arrays, logger = load_trace(args.load_trace)
+    else:
+        wavelet = parse_wavelet(args.wavelet)
+        logger = AccessLogger() if args.logger == "records" else CompactAccessLogger()
+        arrays = construct_all_arrays(
+            [random.randrange(100) for _ in range(args.num_values)], wavelet, logger
+        )
+        ORDERS[args.order](arrays, wavelet)
+
+    print(
+        format_report(
+            analyse_live_set(logger),
+            [array.name for array in arrays],
+            timeline=args.timeline,
+        ),
+        end="",
+    )
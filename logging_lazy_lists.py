@@ -3,27 +3,50 @@ r"""
 on first access (lazy) and accesses are logged by a :py:class:`AccessLogger`.
 In this way, the sequence of computations and data flows which led to each
 array value being computed can be tracked.
+
+For long signals, where only the coarse flow of data is of interest, lists
+may be given a page size. Values are then computed a whole page at a time
+(see :py:meth:`LoggingLazyList.compute_values`) and calls and accesses are
+logged per page rather than per value: the 'index' in each log record is a
+page number.
+
+Full tracing is expensive. Loggers may instead opt out of tracing altogether
+(see :py:attr:`AccessLogger.traced`), in which case lists skip all logging
+and, optionally, just update a set of :py:class:`ArrayCounters` (see the
+:py:mod:`counting_logger` module).
 """
 
 from typing import (
+    Any,
     Optional,
     List,
     Tuple,
     MutableMapping,
+    Sequence,
+    Protocol,
     Iterator,
     Iterable,
     NamedTuple,
     TypeVar,
     Generic,
     Union,
+    Generator,
+    Callable,
+    cast,
 )
 
 from dataclasses import dataclass, field
 
 from contextlib import contextmanager
 
+from time import perf_counter_ns
+
 from vc2_wavelet_definitions import LiftingStage
 
+from compiled_lifting import CompiledStage, compile_stage
+
+from lifting_analysis import tap_offsets
+
 
 @dataclass
 class AccessRecord:
@@ -45,8 +68,98 @@ class CallRecord:
     access_log: List[AccessRecord] = field(default_factory=list)
 
 
+class CallLogEntry(Protocol):
+    """
+    The attributes of a call in an :py:attr:`AccessLogger.call_log`: a
+    :py:class:`CallRecord` or a read-only view with the same attributes.
+    """
+
+    @property
+    def array_name(self) -> str:
+        ...
+
+    @property
+    def index(self) -> int:
+        ...
+
+    @property
+    def start_time(self) -> int:
+        ...
+
+    @property
+    def end_time(self) -> Optional[int]:
+        ...
+
+    @property
+    def access_log(self) -> List[AccessRecord]:
+        ...
+
+
+class ArrayCounters:
+    """
+    Cheap, aggregate counts of the activity in a single array, maintained
+    by :py:class:`LoggingLazyList` for untraced loggers which request them
+    (see :py:meth:`AccessLogger.array_counters`).
+
+    For paged lists, accesses and computations are counted per page.
+    """
+
+    __slots__ = ("accesses", "hits", "computations", "self_ns", "total_ns", "_nesting")
+
+    accesses: int
+    hits: int
+    """The number of accesses and those which found an already known value."""
+
+    computations: int
+    """The number of values computed."""
+
+    self_ns: int
+    total_ns: int
+    """
+    Time spent computing values (in nanoseconds, see
+    :py:func:`time.perf_counter_ns`), excluding and including the time spent
+    computing values in other arrays.
+    """
+
+    _nesting: List[int]
+    """
+    The time spent in nested computations for each computation currently in
+    progress. Shared by the counters of every array sharing a logger.
+    """
+
+    def __init__(self, nesting: List[int]) -> None:
+        self.accesses = 0
+        self.hits = 0
+        self.computations = 0
+        self.self_ns = 0
+        self.total_ns = 0
+        self._nesting = nesting
+
+    def time_computation(self, compute: Callable[[int], None], index: int) -> None:
+        """Call compute(index), counting a computation and timing it."""
+        nesting = self._nesting
+        nesting.append(0)
+        start = perf_counter_ns()
+        try:
+            compute(index)
+        finally:
+            elapsed = perf_counter_ns() - start
+            nested = nesting.pop()
+            if nesting:
+                nesting[-1] += elapsed
+            self.computations += 1
+            self.self_ns += elapsed - nested
+            self.total_ns += elapsed
+
+
 class AccessLogger:
 
+    traced: bool = True
+    """
+    If False, lists do not call any of the logging methods (e.g.
+    :py:meth:`begin_call`), avoiding all per-access bookkeeping.
+    """
+
     _time: int
     """Current timestamp."""
 
@@ -56,10 +169,8 @@ class AccessLogger:
     accessed during the call.
     """
 
-    call_log: List[CallRecord]
-    """
-    Complete list of calls, ordered by start time.
-    """
+    _call_log: List[CallRecord]
+    """The calls logged so far (see :py:attr:`call_log`)."""
 
     first_access_time: MutableMapping[Tuple[str, int], int]
     last_access_time: MutableMapping[Tuple[str, int], int]
@@ -71,10 +182,17 @@ class AccessLogger:
     def __init__(self) -> None:
         self._time = 0
         self._call_stack = []
-        self.call_log = []
+        self._call_log = []
         self.first_access_time = {}
         self.last_access_time = {}
 
+    @property
+    def call_log(self) -> Sequence[CallLogEntry]:
+        """
+        Complete list of calls, ordered by start time.
+        """
+        return self._call_log
+
     @property
     def time(self) -> int:
         """
@@ -85,6 +203,60 @@ class AccessLogger:
         self._time += 1
         return self._time
 
+    def begin_call(self, array_name: str, index: int) -> Any:
+        """
+        Record the start of the process of computing a value of an array.
+
+        Takes the array name and index corresponding to the value which is
+        being computed. Returns an opaque handle which must be passed to
+        :py:meth:`end_call` when the computation completes.
+        """
+        call_record = CallRecord(array_name, index, self.time)
+        self._call_stack.append(call_record)
+        self._call_log.append(call_record)
+        return call_record
+
+    def end_call(self, call: Any) -> None:
+        """
+        Record the end of a computation started with :py:meth:`begin_call`.
+        """
+        assert self._call_stack.pop(-1) == call
+        call.end_time = self.time
+
+    def begin_access(self, array_name: str, index: int) -> Any:
+        """
+        Record the start of the process of accessing a value in another array.
+
+        Takes the array name and index corresponding to the value which is
+        being accessed. Returns an opaque handle which must be passed to
+        :py:meth:`end_access` when the access completes.
+        """
+        access_record = AccessRecord(array_name, index, self.time)
+        if self._call_stack:
+            self._call_stack[-1].access_log.append(access_record)
+        return access_record
+
+    def end_access(self, access: Any) -> None:
+        """
+        Record the end of an access started with :py:meth:`begin_access`.
+        """
+        t = self.time
+
+        access.end_time = t
+
+        key = (access.array_name, access.index)
+        if key not in self.first_access_time:
+            self.first_access_time[key] = t
+
+        self.last_access_time[key] = t
+
+    def array_counters(self, array_name: str) -> Optional[ArrayCounters]:
+        """
+        Get the counters to be maintained by the named array, or None if no
+        counters are required. Only used when :py:attr:`traced` is False.
+        """
+        return None
+
     @contextmanager
     def new_context(self, array_name: str, index: int) -> Iterator[None]:
         """
@@ -94,15 +266,11 @@ class AccessLogger:
         Takes the array name and index corresponding to the value which is
         being computed.
         """
-        call_record = CallRecord(array_name, index, self.time)
-        self._call_stack.append(call_record)
-        self.call_log.append(call_record)
-
+        call = self.begin_call(array_name, index)
         try:
             yield
         finally:
-            assert self._call_stack.pop(-1) == call_record
-            call_record.end_time = self.time
+            self.end_call(call)
 
     @contextmanager
     def log_access(self, array_name: str, index: int) -> Iterator[None]:
@@ -113,21 +281,11 @@ class AccessLogger:
         Takes the array name and index corresponding to the value which is
         being accessed.
         """
-        access_record = AccessRecord(array_name, index, self.time)
-        if self._call_stack:
-            self._call_stack[-1].access_log.append(access_record)
-
+        access = self.begin_access(array_name, index)
         try:
             yield
         finally:
-            t = self.time
-
-            access_record.end_time = t
-
-            if (array_name, index) not in self.first_access_time:
-                self.first_access_time[(array_name, index)] = t
-
-            self.last_access_time[(array_name, index)] = t
+            self.end_access(access)
 
 
 class Unknown(NamedTuple):
@@ -140,6 +298,12 @@ class Unknown(NamedTuple):
 T = TypeVar("T")
 
 
+ValueSteps = Generator[Tuple["LoggingLazyList[Any]", int], Any, T]
+"""
+The type of a :py:meth:`LoggingLazyList.compute_value_steps` generator.
+"""
+
+
 class LoggingLazyList(Generic[T]):
     """
     Base class. implementers should implement the :py:meth:`compute_value`
@@ -150,11 +314,22 @@ class LoggingLazyList(Generic[T]):
     _values: List[Union[T, Unknown]]
     _logger: AccessLogger
 
+    page_size: int
+    """
+    The number of values computed (and logged) together. When 1, every value
+    is computed and logged individually.
+    """
+
+    _traced: bool
+    _counters: Optional[ArrayCounters]
+    """See :py:attr:`AccessLogger.traced`."""
+
     def __init__(
         self,
         name: str,
         length_or_values: Union[int, Iterable[Union[T, Unknown]]],
         logger: AccessLogger,
+        page_size: int = 1,
     ) -> None:
         self.name = name
 
@@ -165,27 +340,187 @@ class LoggingLazyList(Generic[T]):
 
         self._logger = logger
 
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1.")
+        self.page_size = page_size
+
+        self._traced = logger.traced
+        self._counters = None if self._traced else logger.array_counters(name)
+
     def __len__(self) -> int:
         return len(self._values)
 
+    @property
+    def num_pages(self) -> int:
+        return -(-len(self._values) // self.page_size)
+
     def __getitem__(self, index: int) -> T:
+        if not self._traced:
+            value = self._values[index]
+            if self._counters is None and not isinstance(value, Unknown):
+                return value
+            self._touch_untraced(index // self.page_size)
+            return cast(T, self._values[index])
+
+        if self.page_size != 1:
+            page = index // self.page_size
+            with self._logger.log_access(self.name, page):
+                if isinstance(self._values[index], Unknown):
+                    self._evaluate_page(page)
+                return cast(T, self._values[index])
+
         with self._logger.log_access(self.name, index):
             existing_value = self._values[index]
 
             if isinstance(existing_value, Unknown):
-                with self._logger.new_context(self.name, index):
-                    value = self.compute_value(index)
-                self._values[index] = value
-                return value
+                return self._evaluate(index)
             else:
                 return existing_value
 
+    def _evaluate(self, index: int) -> T:
+        """
+        Compute (and store) the as-yet unknown value at the specified index,
+        along with any other unknown values it depends on.
+
+        Rather than recursing (via :py:meth:`__getitem__`) into the arrays
+        this value depends on, the :py:meth:`compute_value_steps` generators
+        of the values being computed are kept on an explicit stack. This
+        allows arbitrarily long chains of dependencies to be evaluated while
+        logging exactly the same sequence of calls and accesses as the
+        recursive equivalent.
+        """
+        logger = self._logger
+
+        # The values being computed. Each entry is a tuple (array, index,
+        # compute_value_steps generator, call handle, handle of the access
+        # which triggered the computation or None for this value).
+        stack: List[
+            Tuple[LoggingLazyList[Any], int, ValueSteps[Any], Any, Optional[Any]]
+        ] = [
+            (
+                self,
+                index,
+                self.compute_value_steps(index),
+                logger.begin_call(self.name, index),
+                None,
+            )
+        ]
+
+        # The value to send to the generator on top of the stack
+        value: Any = None
+        try:
+            while True:
+                array, array_index, steps, call, access = stack[-1]
+                try:
+                    source, source_index = steps.send(value)
+                except StopIteration as stop:
+                    stack.pop()
+                    logger.end_call(call)
+                    value = array._values[array_index] = stop.value
+                    if access is None:
+                        return value
+                    logger.end_access(access)
+                    continue
+
+                source_access = logger.begin_access(source.name, source_index)
+                try:
+                    value = source._values[source_index]
+                except BaseException:
+                    logger.end_access(source_access)
+                    raise
+                if isinstance(value, Unknown):
+                    stack.append(
+                        (
+                            source,
+                            source_index,
+                            source.compute_value_steps(source_index),
+                            logger.begin_call(source.name, source_index),
+                            source_access,
+                        )
+                    )
+                    value = None
+                else:
+                    logger.end_access(source_access)
+        except BaseException:
+            # Close the log entries of the abandoned computations, just as the
+            # equivalent recursive evaluation would.
+            for _, _, _, call, access in reversed(stack):
+                logger.end_call(call)
+                if access is not None:
+                    logger.end_access(access)
+            raise
+
+    def _touch_untraced(self, page: int) -> None:
+        """
+        Untraced equivalent of accessing a page (or value, for unpaged
+        lists): computes it if unknown and updates the counters (if any).
+
+        NB: Unlike :py:meth:`_evaluate`, values are computed recursively, via
+        the source arrays' :py:meth:`__getitem__`, with a recursion depth
+        proportional to the number of arrays in the chain.
+        """
+        counters = self._counters
+        if counters is not None:
+            counters.accesses += 1
+        if isinstance(self._values[page * self.page_size], Unknown):
+            if counters is None:
+                self._compute_page(page)
+            else:
+                counters.time_computation(self._compute_page, page)
+        elif counters is not None:
+            counters.hits += 1
+
+    def _compute_page(self, page: int) -> None:
+        """Compute (and store) a page (or value) without any logging."""
+        if self.page_size == 1:
+            self._values[page] = self.compute_value(page)
+        else:
+            start = page * self.page_size
+            stop = min(start + self.page_size, len(self))
+            self._values[start:stop] = self.compute_values(start, stop)
+
+    def _evaluate_page(self, page: int) -> None:
+        """Compute (and store) every value in an as-yet unknown page."""
+        start = page * self.page_size
+        stop = min(start + self.page_size, len(self))
+        with self._logger.new_context(self.name, page):
+            self._values[start:stop] = self.compute_values(start, stop)
+
+    def get_range(self, start: int, stop: int) -> List[T]:
+        """
+        Get the values from index 'start' up to (but not including) 'stop',
+        logging one access for each page (or value, for unpaged lists)
+        touched.
+        """
+        if self.page_size == 1:
+            return [self[i] for i in range(start, stop)]
+
+        for page in range(start // self.page_size, -(-stop // self.page_size)):
+            if not self._traced:
+                self._touch_untraced(page)
+                continue
+            with self._logger.log_access(self.name, page):
+                if isinstance(self._values[page * self.page_size], Unknown):
+                    self._evaluate_page(page)
+        return cast(List[T], self._values[start:stop])
+
     def iter_current_values(self) -> Iterator[Union[T, Unknown]]:
         return iter(self._values)
 
+    def iter_current_pages(self) -> Iterator[Union[T, Unknown]]:
+        """
+        Iterate over the (first) value of each page. For unpaged lists this
+        is the same as :py:meth:`iter_current_values`.
+        """
+        return iter(self._values[:: self.page_size])
+
     def __iter__(self) -> Iterator[T]:
-        for i in range(len(self)):
-            yield self[i]
+        if self.page_size == 1:
+            for i in range(len(self)):
+                yield self[i]
+        else:
+            for start in range(0, len(self), self.page_size):
+                yield from self.get_range(start, start + self.page_size)
 
     def __repr__(self) -> str:
         return f"<{type(self).__name__} {self.name} {repr(self._values)}>"
@@ -193,6 +528,30 @@ class LoggingLazyList(Generic[T]):
     def compute_value(self, index: int) -> T:
         raise NotImplementedError()
 
+    def compute_values(self, start: int, stop: int) -> List[T]:
+        """
+        Compute the values from index 'start' up to (but not including)
+        'stop'. Used in place of :py:meth:`compute_value` when the list has a
+        page size, in which case any source values should be obtained using
+        :py:meth:`get_range`.
+
+        The default implementation just calls :py:meth:`compute_value` for
+        each index.
+        """
+        return [self.compute_value(index) for index in range(start, stop)]
+
+    def compute_value_steps(self, index: int) -> "ValueSteps[T]":
+        """
+        A generator equivalent of :py:meth:`compute_value` which, rather than
+        indexing other arrays directly, yields (array, index) tuples and is
+        sent the corresponding values. The generator returns the computed
+        value.
+
+        The default implementation just calls :py:meth:`compute_value`.
+        """
+        return self.compute_value(index)
+        yield  # Unreachable: makes this function a generator
+
 
 class LiftedLLL(LoggingLazyList[int]):
     """
@@ -203,34 +562,59 @@ class LiftedLLL(LoggingLazyList[int]):
     _source: LoggingLazyList[int]
     _lift: LiftingStage
 
+    _kernel: CompiledStage
+    """The lifting stage, compiled for the length of this array."""
+
+    _min_offset: int
+    _max_offset: int
+    """The range of source offsets read when computing a value."""
+
     def __init__(
         self,
         name: str,
         source: LoggingLazyList[int],
         lift: LiftingStage,
         logger: AccessLogger,
+        page_size: int = 1,
     ) -> None:
-        super().__init__(name, len(source), logger)
+        super().__init__(name, len(source), logger, page_size)
         self._source = source
         self._lift = lift
+        self._kernel = compile_stage(lift, len(source))
+        offsets = tap_offsets(lift) + [0]
+        self._min_offset = min(offsets)
+        self._max_offset = max(offsets)
 
     def compute_value(self, index: int) -> int:
-        lift_type, S, L, D, taps = self._lift
-
-        even = (index % 2) == 0
-        if lift_type.update_even == even:
-            sum = 0
-            for i in range(D, L + D):
-                pos = index + (2 * i) - 1
-                pos = min(pos, len(self._source) - (1 if lift_type.update_even else 2))
-                pos = max(pos, 1 if lift_type.update_even else 0)
-                sum += taps[i - D] * self._source[pos]
-            if S > 0:
-                sum += 1 << (S - 1)
-            sum >>= S
-            if lift_type.add:
-                return self._source[index] + sum
-            else:
-                return self._source[index] - sum
-        else:
-            return self._source[index]
+        return self._kernel.compute_value(self._source, index)
+
+    def compute_value_steps(self, index: int) -> "ValueSteps[int]":
+        return self._kernel.compute_value_steps(self._source, index)
+
+    def compute_values(self, start: int, stop: int) -> List[int]:
+        # NB: Taps clamped at the edges of the array always fall between the
+        # unclamped position and the computed index so fetching the unclamped
+        # window (limited to the array) fetches every source value needed.
+        window_start = max(0, start + self._min_offset)
+        window_stop = min(len(self), stop + self._max_offset)
+        window = _Window(
+            self._source.get_range(window_start, window_stop), window_start
+        )
+        compute_value = self._kernel.compute_value
+        return [compute_value(window, index) for index in range(start, stop)]
+
+
+class _Window:
+    """
+    A contiguous range of a larger list's values, indexed as in the larger
+    list.
+    """
+
+    __slots__ = ("_values", "_start")
+
+    def __init__(self, values: List[int], start: int) -> None:
+        self._values = values
+        self._start = start
+
+    def __getitem__(self, index: int) -> int:
+        return self._values[index - self._start]
@@ -0,0 +1,308 @@
+"""
+Multi-level (dyadic) wavelet transforms built from the single-level lifting
+filters.
+
+At each level of analysis, the low-pass (even) outputs of the previous level
+are transformed again, while the high-pass (odd) outputs are retained as a
+subband. Synthesis reverses this process, starting from the lowest level.
+
+Both block (:py:func:`analyse_multi_level` and :py:func:`synthesise_multi_level`)
+and streaming (:py:class:`StreamingMultiLevelAnalysis` and
+:py:class:`StreamingMultiLevelSynthesis`) implementations are provided.
+"""
+
+from typing import List, Iterable, Iterator, NamedTuple, Deque
+
+from collections import deque
+
+import numpy as np
+
+from vc2_wavelet_definitions import (
+    WaveletFilters,
+    ANALYSIS_FILTERS,
+    SYNTHESIS_FILTERS,
+)
+
+from numpy_lifting import ArrayLike, analyse, synthesise
+
+from streaming_lifting import StreamingLiftingChain
+
+
+class SubbandSample(NamedTuple):
+    """A single coefficient produced by a multi-level analysis."""
+
+    level: int
+    """
+    The transform level (1 is the first level of analysis, i.e. the one
+    operating on the input signal).
+    """
+
+    high_pass: bool
+    """
+    True for high-pass coefficients. Low-pass coefficients are only produced
+    by the final level.
+    """
+
+    value: int
+
+
+def analyse_multi_level(
+    values: ArrayLike, wavelet: WaveletFilters, levels: int
+) -> List[np.ndarray]:
+    """
+    Perform a multi-level wavelet analysis.
+
+    Returns a list of subbands with the final level's low-pass band first,
+    followed by the high-pass bands from the final level up to the first
+    level (i.e. from lowest to highest frequency).
+    """
+    low = np.asarray(values)
+    high_bands: List[np.ndarray] = []
+    for _ in range(levels):
+        coeffs = analyse(low, wavelet)
+        high_bands.insert(0, coeffs[1::2])
+        low = coeffs[0::2]
+    return [low] + high_bands
+
+
+def synthesise_multi_level(
+    subbands: List[np.ndarray], wavelet: WaveletFilters
+) -> np.ndarray:
+    """
+    Perform a multi-level wavelet synthesis. Takes a list of subbands as
+    produced by :py:func:`analyse_multi_level`.
+    """
+    low = np.asarray(subbands[0])
+    for high in subbands[1:]:
+        coeffs = np.empty(len(low) + len(high), dtype=np.result_type(low, high))
+        coeffs[0::2] = low
+        coeffs[1::2] = high
+        low = synthesise(coeffs, wavelet)
+    return low
+
+
+def multi_level_latency(chain_delay: int, levels: int) -> int:
+    """
+    Compute the latency (in samples at the input of the first level) of a
+    multi-level streaming transform where each level's lifting chain has the
+    specified delay (in samples at that level's input).
+
+    Since each successive level runs at half the sample rate of the previous
+    one, a delay of 'd' samples at level 'k' corresponds to 'd * 2**(k - 1)'
+    samples at the input.
+    """
+    return chain_delay * ((2 ** levels) - 1)
+
+
+class StreamingMultiLevelAnalysis:
+    """
+    A streaming multi-level wavelet analysis.
+
+    Each level is implemented by its own :py:class:`StreamingLiftingChain`
+    (and so has its own independently sized buffers). Input samples are fed
+    in using :py:meth:`push` and the end of the stream signalled with
+    :py:meth:`flush`. Both return the :py:class:`SubbandSample`\\s which became
+    available as a result.
+    """
+
+    levels: List[StreamingLiftingChain[int]]
+
+    _num_outputs: List[int]
+    """The number of outputs produced so far by each level."""
+
+    def __init__(self, wavelet: WaveletFilters, levels: int) -> None:
+        self.levels = [
+            StreamingLiftingChain(ANALYSIS_FILTERS[wavelet]) for _ in range(levels)
+        ]
+        self._num_outputs = [0] * levels
+
+    @property
+    def buffer_length(self) -> int:
+        """Total number of samples buffered by all levels."""
+        return sum(chain.buffer_length for chain in self.levels)
+
+    @property
+    def latency(self) -> int:
+        """
+        An upper bound on the number of input samples which must be received
+        after the input sample at the corresponding position before a
+        coefficient can be produced (away from the signal edges).
+        """
+        return multi_level_latency(self.levels[0].delay, len(self.levels))
+
+    def _route(self, level: int, values: List[int]) -> List[SubbandSample]:
+        out = []
+        for value in values:
+            index = self._num_outputs[level]
+            self._num_outputs[level] += 1
+            if index % 2 == 1:
+                out.append(SubbandSample(level + 1, True, value))
+            elif level == len(self.levels) - 1:
+                out.append(SubbandSample(level + 1, False, value))
+            else:
+                out.extend(self._route(level + 1, self.levels[level + 1].push(value)))
+        return out
+
+    def push(self, value: int) -> List[SubbandSample]:
+        """
+        Add the next input sample to the stream. Returns the coefficients
+        which have become available.
+        """
+        return self._route(0, self.levels[0].push(value))
+
+    def flush(self) -> List[SubbandSample]:
+        """
+        Signal the end of the stream. Returns all remaining coefficients.
+        """
+        out = []
+        for level, chain in enumerate(self.levels):
+            out.extend(self._route(level, chain.flush()))
+        return out
+
+
+class StreamingMultiLevelSynthesis:
+    """
+    A streaming multi-level wavelet synthesis.
+
+    Coefficients (:py:class:`SubbandSample`\\s) are fed in using :py:meth:`push`
+    and the end of the stream signalled with :py:meth:`flush`. Both return the
+    output samples which became available as a result.
+
+    Each level consumes its low- and high-pass coefficients alternately.
+    Coefficients arriving ahead of their counterpart in the other subband are
+    queued and so, for bounded memory use, coefficients should be pushed in
+    (approximately) the order :py:class:`StreamingMultiLevelAnalysis` produces
+    them.
+    """
+
+    levels: List[StreamingLiftingChain[int]]
+
+    _low_queues: List[Deque[int]]
+    _high_queues: List[Deque[int]]
+    _num_inputs: List[int]
+    """
+    For each level, the queued low- and high-pass inputs and the number of
+    inputs consumed so far.
+    """
+
+    def __init__(self, wavelet: WaveletFilters, levels: int) -> None:
+        self.levels = [
+            StreamingLiftingChain(SYNTHESIS_FILTERS[wavelet]) for _ in range(levels)
+        ]
+        self._low_queues = [deque() for _ in range(levels)]
+        self._high_queues = [deque() for _ in range(levels)]
+        self._num_inputs = [0] * levels
+
+    @property
+    def buffer_length(self) -> int:
+        """
+        Total number of samples buffered by all levels (excluding any queued
+        coefficients).
+        """
+        return sum(chain.buffer_length for chain in self.levels)
+
+    @property
+    def latency(self) -> int:
+        """
+        An upper bound on the number of coefficients (in units of output
+        samples) which must be received beyond the position of an output
+        sample before it can be produced (away from the signal edges).
+        """
+        return multi_level_latency(self.levels[0].delay, len(self.levels))
+
+    def _consume(self, level: int, flush: bool = False) -> List[int]:
+        """
+        Feed as many queued coefficients as possible into the specified level,
+        returning the samples output by level 1 as a result.
+        """
+        outputs = []
+        while True:
+            queue = (
+                self._high_queues[level]
+                if self._num_inputs[level] % 2
+                else self._low_queues[level]
+            )
+            if not queue:
+                break
+            self._num_inputs[level] += 1
+            outputs.extend(self.levels[level].push(queue.popleft()))
+        if flush:
+            outputs.extend(self.levels[level].flush())
+
+        if level == 0:
+            return outputs
+        else:
+            self._low_queues[level - 1].extend(outputs)
+            return self._consume(level - 1)
+
+    def push(self, sample: SubbandSample) -> List[int]:
+        """
+        Add the next coefficient to the stream. Returns the output samples
+        which have become available.
+        """
+        level = sample.level - 1
+        if sample.high_pass:
+            self._high_queues[level].append(sample.value)
+        elif level == len(self.levels) - 1:
+            self._low_queues[level].append(sample.value)
+        else:
+            raise ValueError("Only the final level has a low-pass subband.")
+        return self._consume(level)
+
+    def flush(self) -> List[int]:
+        """
+        Signal the end of the stream. Returns all remaining output samples.
+        """
+        out = []
+        for level in reversed(range(len(self.levels))):
+            out.extend(self._consume(level, flush=True))
+        return out
+
+
+class PipelineInfo(NamedTuple):
+    """Summary of the resources required by a streaming transform pipeline."""
+
+    latency: int
+    """End-to-end latency in samples."""
+
+    buffer_length: int
+    """Total number of samples buffered across all stages and levels."""
+
+
+def multi_level_pipeline_info(wavelet: WaveletFilters, levels: int) -> PipelineInfo:
+    """
+    Report the end-to-end latency and total buffer footprint of a streaming
+    multi-level analysis immediately followed by a synthesis.
+    """
+    analysis = StreamingMultiLevelAnalysis(wavelet, levels)
+    synthesis = StreamingMultiLevelSynthesis(wavelet, levels)
+    return PipelineInfo(
+        latency=analysis.latency + synthesis.latency,
+        buffer_length=analysis.buffer_length + synthesis.buffer_length,
+    )
+
+
+def stream_multi_level_analysis(
+    samples: Iterable[int], wavelet: WaveletFilters, levels: int
+) -> Iterator[SubbandSample]:
+    """
+    Perform a streaming multi-level wavelet analysis, yielding coefficients
+    as soon as they can be computed.
+    """
+    analysis = StreamingMultiLevelAnalysis(wavelet, levels)
+    for sample in samples:
+        yield from analysis.push(sample)
+    yield from analysis.flush()
+
+
+def stream_multi_level_synthesis(
+    coefficients: Iterable[SubbandSample], wavelet: WaveletFilters, levels: int
+) -> Iterator[int]:
+    """
+    Perform a streaming multi-level wavelet synthesis, yielding output samples
+    as soon as they can be computed.
+    """
+    synthesis = StreamingMultiLevelSynthesis(wavelet, levels)
+    for coefficient in coefficients:
+        yield from synthesis.push(coefficient)
+    yield from synthesis.flush()
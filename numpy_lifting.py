@@ -0,0 +1,233 @@
+"""
+A fast, non-logging implementation of the VC-2 lifting filters which operates
+on whole NumPy arrays at once.
+
+Whereas :py:class:`logging_lazy_lists.LiftedLLL` computes (and logs) one value
+at a time, the functions in this module apply each :py:class:`LiftingStage` as
+a handful of shifted multiply-adds over entire arrays. The edge clamping and
+rounding behaviour is identical to :py:class:`~logging_lazy_lists.LiftedLLL`
+and so the results produced are bit-for-bit identical.
+
+The range of values each stage can produce is worked out in advance (see
+:py:func:`lifting_analysis.stage_ranges`) and each stage's output (and
+accumulator) is stored using the narrowest integer type which can hold it.
+By default, the input is assumed to span the whole range of its dtype, but a
+narrower range (e.g. the bit depth of a video signal) may be given, greatly
+reducing the memory bandwidth required.
+"""
+
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from vc2_wavelet_definitions import (
+    WaveletFilters,
+    LiftingStage,
+    ANALYSIS_FILTERS,
+    SYNTHESIS_FILTERS,
+)
+
+from lifting_analysis import (
+    ValueRange,
+    SignalRange,
+    bit_depth_range,
+    bits_required,
+    signal_value_range,
+    stage_ranges,
+    chain_ranges,
+)
+
+
+ArrayLike = Union[np.ndarray, Sequence[int]]
+
+
+def narrowest_dtype(value_range: ValueRange) -> np.dtype:
+    """
+    The narrowest signed integer dtype which can hold every value in a range.
+
+    NB: If more than 64 bits are required, int64 is returned regardless (and
+    values may overflow).
+    """
+    bits = bits_required(value_range)
+    for dtype in (np.int8, np.int16, np.int32):
+        if bits <= np.iinfo(dtype).bits:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def dtype_range(dtype: np.dtype) -> SignalRange:
+    """The range of a signal which may hold any value of an integer dtype."""
+    if not np.issubdtype(dtype, np.integer):
+        raise TypeError(f"Lifting requires integer values, not {dtype}")
+    info = np.iinfo(dtype)
+    value_range = (int(info.min), int(info.max))
+    return (value_range, value_range)
+
+
+def stage_dtypes(
+    stage: LiftingStage, input_range: SignalRange
+) -> Tuple[np.dtype, np.dtype]:
+    """
+    Choose the (output, accumulator) dtypes for a lifting stage applied to a
+    signal with the specified range.
+    """
+    ranges = stage_ranges(stage, input_range)
+    accumulator_lo, accumulator_hi = ranges.accumulator
+    # NB: The accumulator must also be able to hold the taps themselves
+    largest_tap = max(abs(tap) for tap in stage.taps)
+    return (
+        narrowest_dtype(signal_value_range(ranges.output)),
+        narrowest_dtype(
+            (min(accumulator_lo, -largest_tap), max(accumulator_hi, largest_tap))
+        ),
+    )
+
+
+def output_dtype(stages: List[LiftingStage], input_range: SignalRange) -> np.dtype:
+    """
+    The dtype of the array produced by :py:func:`apply_lifting_stages` for an
+    input with the specified range.
+    """
+    if not stages:
+        return narrowest_dtype(signal_value_range(input_range))
+    return narrowest_dtype(
+        signal_value_range(chain_ranges(stages, input_range)[-1].output)
+    )
+
+
+def lift(
+    values: ArrayLike,
+    stage: LiftingStage,
+    axis: int = -1,
+    input_range: Optional[SignalRange] = None,
+) -> np.ndarray:
+    """
+    Apply a single lifting stage to an array of integers, returning a new
+    array.
+
+    The lifting stage is applied along the specified axis, allowing (for
+    example) the rows or columns of a 2D array to be lifted all at once.
+
+    The returned array uses the narrowest dtype able to hold any output given
+    inputs in 'input_range' (by default, the whole range of the input's
+    dtype).
+    """
+    lift_type, S, L, D, taps = stage
+
+    values = np.asarray(values)
+    if input_range is None:
+        input_range = dtype_range(values.dtype)
+    elif not np.issubdtype(values.dtype, np.integer):
+        raise TypeError(f"Lifting requires integer values, not {values.dtype}")
+    out_dtype, acc_dtype = stage_dtypes(stage, input_range)
+
+    source = np.moveaxis(values, axis, -1)
+    length = source.shape[-1]
+
+    # Indices of the values updated by this stage
+    updated = np.arange(0 if lift_type.update_even else 1, length, 2)
+
+    # Clamp filter taps to the nearest value of the opposite parity at the
+    # edges of the array (exactly as in LiftedLLL.compute_value)
+    lo = 1 if lift_type.update_even else 0
+    hi = length - (1 if lift_type.update_even else 2)
+
+    acc = np.zeros(source.shape[:-1] + updated.shape, dtype=acc_dtype)
+    for i in range(D, L + D):
+        pos = np.clip(updated + (2 * i) - 1, lo, hi)
+        acc += taps[i - D] * source[..., pos].astype(acc_dtype)
+    if S > 0:
+        acc += 1 << (S - 1)
+    acc >>= S
+
+    # NB: The sum is computed in a type wide enough for both operands, but is
+    # guaranteed to fit in the output type
+    out = source.astype(out_dtype)
+    work = out[..., updated].astype(np.promote_types(out_dtype, acc_dtype))
+    if lift_type.add:
+        out[..., updated] = work + acc
+    else:
+        out[..., updated] = work - acc
+
+    return np.moveaxis(out, -1, axis)
+
+
+def apply_lifting_stages(
+    values: ArrayLike,
+    stages: List[LiftingStage],
+    axis: int = -1,
+    input_range: Optional[SignalRange] = None,
+) -> np.ndarray:
+    """
+    Apply a series of lifting stages, one after another, to an array.
+
+    If 'input_range' is given, each intermediate array is stored using the
+    narrowest dtype which can hold its values given inputs in that range. A
+    :py:exc:`ValueError` is raised if the input contains values outside of
+    the range. Otherwise the input is assumed to span the whole range of its
+    dtype.
+    """
+    out = np.asarray(values)
+    if input_range is None:
+        input_range = dtype_range(out.dtype)
+    elif out.size:
+        lo, hi = signal_value_range(input_range)
+        if out.min() < lo or out.max() > hi:
+            raise ValueError(f"Input values outside of the range {lo} to {hi}.")
+
+    for stage in stages:
+        out = lift(out, stage, axis, input_range)
+        input_range = stage_ranges(stage, input_range).output
+    return out
+
+
+def analysis_range(wavelet: WaveletFilters, bit_depth: int) -> SignalRange:
+    """
+    The range of the (even, odd) coefficients produced by a single-level
+    wavelet analysis of a signed signal with the specified bit depth.
+    """
+    ranges = chain_ranges(ANALYSIS_FILTERS[wavelet], bit_depth_range(bit_depth))
+    return ranges[-1].output
+
+
+def analyse(
+    values: ArrayLike,
+    wavelet: WaveletFilters,
+    axis: int = -1,
+    bit_depth: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Perform a single-level wavelet analysis (encode), returning the
+    interleaved low- and high-pass coefficients.
+
+    If the (signed) bit depth of the input is given, the narrowest dtypes
+    able to hold the results are used, otherwise the input is assumed to span
+    the whole range of its dtype.
+    """
+    return apply_lifting_stages(
+        values,
+        ANALYSIS_FILTERS[wavelet],
+        axis,
+        bit_depth_range(bit_depth) if bit_depth is not None else None,
+    )
+
+
+def synthesise(
+    values: ArrayLike,
+    wavelet: WaveletFilters,
+    axis: int = -1,
+    bit_depth: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Perform a single-level wavelet synthesis (decode) of interleaved low- and
+    high-pass coefficients.
+
+    If given, 'bit_depth' is the bit depth of the signal which was analysed
+    to produce the coefficients (see :py:func:`analyse`).
+    """
+    return apply_lifting_stages(
+        values,
+        SYNTHESIS_FILTERS[wavelet],
+        axis,
+        analysis_range(wavelet, bit_depth) if bit_depth is not None else None,
+    )
@@ -0,0 +1,104 @@
+"""
+Reading and writing raw (headerless, little-endian) sample files via memory
+mapping, and transforming such files in bounded memory.
+
+Files are accessed using :py:class:`numpy.memmap` so that samples are read
+directly from (and written directly to) the page cache without loading whole
+files into memory. :py:func:`transform_file` streams a file through all of
+the lifting stages in chunks (see :py:mod:`fused_lifting`) so that
+arbitrarily large captures may be transformed in a single pass.
+"""
+
+from typing import List, Mapping
+
+import numpy as np
+
+from vc2_wavelet_definitions import LiftingStage
+
+from numpy_lifting import dtype_range
+
+from fused_lifting import FusedLiftingChain
+
+
+SAMPLE_FORMATS: Mapping[str, np.dtype] = {
+    "int16": np.dtype("<i2"),
+    "int32": np.dtype("<i4"),
+}
+"""The supported raw sample formats."""
+
+
+def open_samples(filename: str, sample_format: str) -> np.ndarray:
+    """
+    Memory-map a raw sample file (read only).
+    """
+    dtype = SAMPLE_FORMATS[sample_format]
+    with open(filename, "rb") as f:
+        f.seek(0, 2)
+        size = f.tell()
+    if size % dtype.itemsize != 0:
+        raise ValueError(
+            f"{filename} is not a whole number of {sample_format} samples long."
+        )
+    if size == 0:
+        # NB: Empty files cannot be memory mapped
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(filename, dtype=dtype, mode="r")
+
+
+def create_samples(filename: str, sample_format: str, length: int) -> np.ndarray:
+    """
+    Create (or overwrite) a raw sample file of the specified length and
+    memory-map it for writing.
+    """
+    dtype = SAMPLE_FORMATS[sample_format]
+    if length == 0:
+        open(filename, "wb").close()
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(filename, dtype=dtype, mode="w+", shape=(length,))
+
+
+def transform_file(
+    input_filename: str,
+    output_filename: str,
+    stages: List[LiftingStage],
+    input_format: str = "int16",
+    output_format: str = "int32",
+    chunk_size: int = 1 << 20,
+) -> None:
+    """
+    Apply a chain of lifting stages to a raw sample file, writing the result
+    to another raw sample file.
+
+    The input is read 'chunk_size' samples at a time and each sample is read
+    (and each result written) exactly once, so memory usage is bounded
+    regardless of the file size.
+
+    Raises :py:exc:`OverflowError` if a result does not fit in the output
+    sample format. (When the worst-case result is known to fit, this check is
+    skipped.)
+    """
+    samples = open_samples(input_filename, input_format)
+    out = create_samples(output_filename, output_format, len(samples))
+    limits = np.iinfo(out.dtype)
+    chain = FusedLiftingChain(stages, dtype_range(samples.dtype))
+    check_limits = not np.can_cast(chain.output_dtype, out.dtype)
+
+    emitted = 0
+    for start in range(0, len(samples), chunk_size):
+        results = [chain.push(samples[start : start + chunk_size])]
+        if start + chunk_size >= len(samples):
+            results.append(chain.flush())
+        for result in results:
+            if (
+                check_limits
+                and len(result)
+                and (result.min() < limits.min or result.max() > limits.max)
+            ):
+                raise OverflowError(
+                    f"Transformed values do not fit in {output_format} samples."
+                )
+            out[emitted : emitted + len(result)] = result
+            emitted += len(result)
+
+    if isinstance(out, np.memmap):
+        out.flush()
@@ -0,0 +1,274 @@
+"""
+A genuinely streaming implementation of the VC-2 lifting filters.
+
+Each :py:class:`LiftingStage` is implemented as a FIR filter
+(:py:class:`StreamingLiftingStage`) which consumes its input one sample at a
+time and produces output samples as soon as they can be computed. Only a small
+ring buffer of recent input samples, sized according to the stage's filter
+support, is retained. As a consequence, memory usage is independent of the
+signal length and signals of unknown (or unbounded) length may be processed.
+
+Because the lifting filters clamp their taps at the edges of the signal, the
+final few outputs of each stage cannot be produced until the end of the stream
+is signalled (see :py:meth:`StreamingLiftingStage.flush`).
+"""
+
+from typing import (
+    Any,
+    List,
+    Iterable,
+    Iterator,
+    Optional,
+    Protocol,
+    TypeVar,
+    Generic,
+    Union,
+)
+
+from vc2_wavelet_definitions import (
+    WaveletFilters,
+    LiftingStage,
+    ANALYSIS_FILTERS,
+    SYNTHESIS_FILTERS,
+)
+
+from lifting_analysis import (
+    inputs_required,
+    stage_delay,
+    stage_buffer_length,
+    chain_latency,
+)
+
+
+T = TypeVar("T", bound="SupportsLifting")
+
+
+class SupportsLifting(Protocol):
+    """
+    The integer arithmetic used by the lifting filters: samples may be Python
+    ints or, e.g., NumPy integer arrays.
+    """
+
+    def __add__(self: T, other: Any) -> T:
+        ...
+
+    def __radd__(self: T, other: Any) -> T:
+        ...
+
+    def __sub__(self: T, other: Any) -> T:
+        ...
+
+    def __rmul__(self: T, other: Any) -> T:
+        ...
+
+    def __rshift__(self: T, other: Any) -> T:
+        ...
+
+
+class StreamingLiftingStage(Generic[T]):
+    """
+    A single lifting stage implemented as a streaming FIR filter.
+
+    Samples are fed in using :py:meth:`push` and the end of the stream is
+    signalled using :py:meth:`flush`. Both return the (possibly empty) list of
+    output samples which became available as a result.
+
+    Samples may be Python ints or any other type supporting integer arithmetic
+    (see :py:class:`SupportsLifting`, e.g. rows of a picture given as NumPy
+    integer arrays).
+    """
+
+    stage: LiftingStage
+
+    buffer_length: int
+    """Number of input samples retained in the ring buffer."""
+
+    delay: int
+    """
+    The number of input samples which must be received after input sample 'n'
+    before output sample 'n' can be produced, in the worst case.
+    """
+
+    _buffer: List[Optional[T]]
+    """
+    Ring buffer of the most recently received input samples. Input sample 'n'
+    is stored at index 'n % buffer_length'.
+    """
+
+    _received: int
+    """Number of input samples received so far."""
+
+    _emitted: int
+    """Number of output samples produced so far."""
+
+    _length: Optional[int]
+    """The length of the stream (known only once flushed)."""
+
+    def __init__(self, stage: LiftingStage) -> None:
+        self.stage = stage
+        self.delay = stage_delay(stage)
+        self.buffer_length = stage_buffer_length(stage)
+
+        self._buffer = [None] * self.buffer_length
+        self._received = 0
+        self._emitted = 0
+        self._length = None
+
+    def push(self, value: T) -> List[T]:
+        """
+        Add the next input sample to the stream. Returns the output samples
+        which have become available.
+        """
+        if self._length is not None:
+            raise ValueError("Cannot push to a stream which has been flushed.")
+
+        self._buffer[self._received % self.buffer_length] = value
+        self._received += 1
+
+        return self._emit_ready()
+
+    def flush(self) -> List[T]:
+        """
+        Signal the end of the stream. Returns all remaining output samples.
+        """
+        self._length = self._received
+        return self._emit_ready()
+
+    def _is_updated(self, index: int) -> bool:
+        return self.stage.lift_type.update_even == ((index % 2) == 0)
+
+    def _is_ready(self, index: int) -> bool:
+        if self._length is not None:
+            return index < self._length
+        else:
+            return inputs_required(self.stage, index) <= self._received
+
+    def _emit_ready(self) -> List[T]:
+        out = []
+        while self._emitted < self._received and self._is_ready(self._emitted):
+            out.append(self._compute(self._emitted))
+            self._emitted += 1
+        return out
+
+    def _get(self, index: int) -> T:
+        value = self._buffer[index % self.buffer_length]
+        assert value is not None
+        return value
+
+    def _compute(self, index: int) -> T:
+        lift_type, S, L, D, taps = self.stage
+
+        if not self._is_updated(index):
+            return self._get(index)
+
+        # NB: Until the stream is flushed, _is_ready guarantees that no tap
+        # reaches beyond the (as yet unknown) end of the stream.
+        lo = 1 if lift_type.update_even else 0
+        hi = None
+        if self._length is not None:
+            hi = self._length - (1 if lift_type.update_even else 2)
+
+        sum: Union[int, T] = 0
+        for i in range(D, L + D):
+            pos = index + (2 * i) - 1
+            if hi is not None:
+                pos = min(pos, hi)
+            pos = max(pos, lo)
+            sum = sum + (taps[i - D] * self._get(pos))
+        if S > 0:
+            sum = sum + (1 << (S - 1))
+        sum = sum >> S
+
+        if lift_type.add:
+            return self._get(index) + sum
+        else:
+            return self._get(index) - sum
+
+
+class StreamingLiftingChain(Generic[T]):
+    """
+    A series of :py:class:`StreamingLiftingStage`\\s connected one after
+    another.
+    """
+
+    stages: List[StreamingLiftingStage[T]]
+
+    def __init__(self, lifting_stages: List[LiftingStage]) -> None:
+        self.stages = [StreamingLiftingStage(stage) for stage in lifting_stages]
+
+    @property
+    def buffer_length(self) -> int:
+        """Total number of samples buffered by all stages."""
+        return sum(stage.buffer_length for stage in self.stages)
+
+    @property
+    def delay(self) -> int:
+        """
+        The number of input samples which must be received after input sample
+        'n' before output sample 'n' can be produced, in the worst case.
+
+        (This is often less than the sum of the individual stages' delays, see
+        :py:func:`lifting_analysis.chain_latency`.)
+        """
+        return chain_latency([stage.stage for stage in self.stages])
+
+    def push(self, value: T) -> List[T]:
+        """
+        Add the next input sample to the stream. Returns the output samples
+        which have become available.
+        """
+        values = [value]
+        for stage in self.stages:
+            values = [out for value in values for out in stage.push(value)]
+        return values
+
+    def flush(self) -> List[T]:
+        """
+        Signal the end of the stream. Returns all remaining output samples.
+        """
+        values: List[T] = []
+        for stage in self.stages:
+            values = [out for value in values for out in stage.push(value)]
+            values.extend(stage.flush())
+        return values
+
+
+def stream_lifting_stages(
+    samples: Iterable[T], lifting_stages: List[LiftingStage]
+) -> Iterator[T]:
+    """
+    Apply a series of lifting stages to a stream of samples, yielding output
+    values as soon as they can be computed.
+    """
+    chain: StreamingLiftingChain[T] = StreamingLiftingChain(lifting_stages)
+    for sample in samples:
+        yield from chain.push(sample)
+    yield from chain.flush()
+
+
+def stream_analysis(samples: Iterable[T], wavelet: WaveletFilters) -> Iterator[T]:
+    """
+    Perform a streaming single-level wavelet analysis (encode), yielding
+    interleaved low- and high-pass coefficients.
+    """
+    return stream_lifting_stages(samples, ANALYSIS_FILTERS[wavelet])
+
+
+def stream_synthesis(
+    coefficients: Iterable[T], wavelet: WaveletFilters
+) -> Iterator[T]:
+    """
+    Perform a streaming single-level wavelet synthesis (decode) of interleaved
+    low- and high-pass coefficients.
+    """
+    return stream_lifting_stages(coefficients, SYNTHESIS_FILTERS[wavelet])
+
+
+def stream_analysis_then_synthesis(
+    samples: Iterable[T], wavelet: WaveletFilters
+) -> Iterator[T]:
+    """
+    Encode and then immediately decode a stream of samples, yielding the
+    decoded samples as soon as they can be computed.
+    """
+    return stream_synthesis(stream_analysis(samples, wavelet), wavelet)
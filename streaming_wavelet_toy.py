@@ -1,10 +1,12 @@
-from typing import List, Iterator, cast
+from typing import Callable, List, Iterator, Mapping, Optional, TextIO, cast
 
-from textwrap import indent, dedent
+from textwrap import indent
 
-import time
+import sys
+
+import shutil
 
-import json
+import time
 
 import random
 
@@ -12,7 +14,19 @@ from argparse import ArgumentParser
 
 from logging_lazy_lists import AccessLogger, LoggingLazyList, LiftedLLL
 
-from ascii_diagrams import Appearance, draw_array, draw_connections
+from compact_access_logger import CompactAccessLogger
+
+from ascii_diagrams import DrawingOptions, Viewport, draw_array, draw_connections
+
+from animation_timeline import AnimationTimeline
+
+from terminal_delta import CLEAR_SCREEN, DeltaEncoder
+
+from animation_export import write_terminalizer, write_asciicast
+
+from lifting_analysis import stage_delay, tap_offsets
+
+from trace_file import save_trace, load_trace
 
 from vc2_wavelet_definitions import (
     WaveletFilters,
@@ -28,6 +42,7 @@ def construct_lifted_arrays(
     lifting_stages: List[LiftingStage],
     intermediate_name_prefix: str,
     final_name: str,
+    page_size: int = 1,
 ) -> List[LoggingLazyList[int]]:
     out: List[LoggingLazyList[int]] = []
     previous_array = input_lll
@@ -37,17 +52,22 @@ def construct_lifted_arrays(
             if i != len(lifting_stages) - 1
             else final_name
         )
-        array = LiftedLLL(name, previous_array, stage, logger)
+        array = LiftedLLL(name, previous_array, stage, logger, page_size)
         out.append(array)
         previous_array = array
     return out
 
 
 def construct_all_arrays(
-    input_values: List[int], wavelet: WaveletFilters, logger: AccessLogger,
+    input_values: List[int],
+    wavelet: WaveletFilters,
+    logger: AccessLogger,
+    page_size: int = 1,
 ) -> List[LoggingLazyList[int]]:
     arrays = []
-    arrays.append(LoggingLazyList("Encoder Input", input_values, logger))
+    arrays.append(
+        LoggingLazyList("Encoder Input", input_values, logger, page_size)
+    )
     arrays.extend(
         construct_lifted_arrays(
             arrays[-1],
@@ -55,6 +75,7 @@ def construct_all_arrays(
             ANALYSIS_FILTERS[wavelet],
             "Encode Intermediate ",
             "Encode Out/Decode In",
+            page_size,
         )
     )
     arrays.extend(
@@ -64,30 +85,58 @@ def construct_all_arrays(
             SYNTHESIS_FILTERS[wavelet],
             "Decode Intermediate ",
             "Decoder Output",
+            page_size,
         )
     )
 
     return arrays
 
 
+def _last_source_page(
+    stage: LiftingStage, array: LoggingLazyList[int], page: int
+) -> int:
+    """
+    The last page of its source array read when computing a page of a
+    :py:class:`LiftedLLL` (see :py:meth:`LiftedLLL.compute_values`).
+    """
+    reach = max(tap_offsets(stage) + [0])
+    stop = min((page + 1) * array.page_size, len(array))
+    return min(len(array) - 1, stop - 1 + reach) // array.page_size
+
+
 def access_like_chained_filters(
     arrays: List[LoggingLazyList[int]], wavelet: WaveletFilters,
 ) -> None:
     """
     Trigger computation of array values as if lifting stages were a series of
     chained FIR filters.
-    """
-    # XXX: Delays may be too long/short
-    delays = [0]
-    for stage in ANALYSIS_FILTERS[wavelet]:
-        delays.append(delays[-1] + stage.L)
-    for stage in SYNTHESIS_FILTERS[wavelet]:
-        delays.append(delays[-1] + stage.L)
 
-    for i in range(len(arrays[-1]) + max(delays)):
-        for delay, array in zip(delays, arrays):
-            if 0 <= i - delay < len(array):
-                array[i - delay]
+    Each filter runs behind the one before it by exactly the delay it needs
+    to have received all of the inputs required by each output (see
+    :py:func:`lifting_analysis.stage_delay`). Paged arrays are accessed once
+    per page, so each stage's delay is rounded up to a whole number of pages:
+    the inputs required by the last value in a page then lie no further than
+    the end of the source page they land in, which has already been computed.
+    """
+    stages = ANALYSIS_FILTERS[wavelet] + SYNTHESIS_FILTERS[wavelet]
+    page_size = arrays[0].page_size
+    delays = [0]  # In pages
+    for stage in stages:
+        delays.append(delays[-1] - (-stage_delay(stage) // page_size))
+
+    num_pages = arrays[-1].num_pages
+    pages_computed = [0] * len(arrays)
+    for i in range(num_pages + max(delays)):
+        for n, (delay, array) in enumerate(zip(delays, arrays)):
+            page = i - delay
+            if 0 <= page < num_pages:
+                # Never start computing a page whose source pages aren't
+                # already computed (which would result in lazy evaluation)
+                assert n == 0 or pages_computed[n - 1] > _last_source_page(
+                    stages[n - 1], array, page
+                )
+                array[min((page + 1) * page_size, len(array)) - 1]
+                pages_computed[n] += 1
 
 
 def access_on_demand_encode_then_decode(
@@ -121,58 +170,99 @@ def access_like_block_filter(
         list(array)
 
 
+ORDERS: Mapping[
+    str, Callable[[List[LoggingLazyList[int]], WaveletFilters], None]
+] = {
+    "block": access_like_block_filter,
+    "chained": access_like_chained_filters,
+    "lazy": access_on_demand,
+    "lazy_two_steps": access_on_demand_encode_then_decode,
+}
+"""The computation orders which may be animated, by (command line) name."""
+
+
+def _follow_active_call(
+    viewport: Viewport, timeline: AnimationTimeline, num_arrays: int, t: int
+) -> None:
+    """
+    Scroll a viewport to show the most recently started call in progress
+    and the value it most recently accessed.
+    """
+    latest = None
+    for n in range(num_arrays):
+        active_call = timeline.active_call(n)
+        if active_call is not None and (
+            latest is None or active_call.start_time > latest.start_time
+        ):
+            latest = active_call
+    if latest is not None:
+        viewport.follow(latest.index, *latest.sources(t)[-1:])
+
+
 def generate_animation(
     arrays: List[LoggingLazyList[int]],
     logger: AccessLogger,
     start: int = 0,
     end: int = -1,
+    width: Optional[int] = None,
 ) -> Iterator[str]:
     """
     Display the animated access/computation pattern which was logged.
+
+    If 'width' (in characters) is given, only as many cells as fit in that
+    width are drawn, scrolling to follow the computation in progress.
     """
     name_col_width = max(len(a.name) + 1 for a in arrays)
 
+    timeline = AnimationTimeline(arrays, logger)
+    timeline.seek(start)
+
+    viewport: Optional[Viewport] = None
+    if width is not None:
+        viewport = Viewport(
+            (width - name_col_width - 1) // DrawingOptions().box_width,
+            max(array.num_pages for array in arrays),
+        )
+
+    # Arrays are only redrawn when they (or the part in view) change
+    drawn_values: List[str] = [""] * len(arrays)
+    drawn_first: List[int] = [0] * len(arrays)
+
     for t in range(start, end if end >= 0 else logger.time + 2 - end):
-        frame = "\033[2J\033[H"
-        for array in arrays:
+        timeline.advance(t)
+
+        first = 0
+        count: Optional[int] = None
+        if viewport is not None:
+            _follow_active_call(viewport, timeline, len(arrays), t)
+            first = viewport.first
+            count = viewport.size
+
+        frame = ""
+        for n, array in enumerate(arrays):
             joins: str
 
-            for call_record in logger.call_log:
-                if (
-                    call_record.array_name == array.name
-                    and call_record.start_time <= t <= (call_record.end_time or 0)
-                ):
-                    sources = [
-                        access.index
-                        for access in call_record.access_log
-                        if access.start_time <= t
-                    ]
-                    joins = draw_connections(sources, call_record.index)
-                    break
+            active_call = timeline.active_call(n)
+            if active_call is not None:
+                joins = draw_connections(
+                    active_call.sources(t),
+                    active_call.index,
+                    first=first,
+                    count=count,
+                )
             else:
                 joins = "\n\n"
 
-            values = draw_array(
-                [
-                    None
-                    if t < logger.first_access_time.get((array.name, i), -1)
-                    else v
-                    if isinstance(v, int)
-                    else None
-                    for i, v in enumerate(array.iter_current_values())
-                ],
-                [
-                    Appearance.dashed_border
-                    if t < logger.first_access_time.get((array.name, i), -1)
-                    else Appearance.dashed_border
-                    if (
-                        t > logger.last_access_time.get((array.name, i), -1)
-                        and array != arrays[-1]
-                    )
-                    else Appearance.solid_border
-                    for i in range(len(array))
-                ],
-            )
+            if timeline.changed[n] or drawn_first[n] != first:
+                drawn_values[n] = draw_array(
+                    timeline.values[n],
+                    timeline.appearances[n],
+                    first=first,
+                    count=count,
+                )
+                drawn_first[n] = first
+                timeline.changed[n] = False
+            values = drawn_values[n]
 
             if array != arrays[0]:
                 frame += (indent(joins, " " * name_col_width)) + "\n"
@@ -187,6 +277,9 @@ def generate_animation(
         frame += "Key:    ;     ;  used for         |     |  be used in\n"
         frame += "         - - -   any future        =====   a future\n"
         frame += "                 computation               computation\n"
+        if viewport is not None:
+            last = min(first + viewport.size, viewport.length) - 1
+            frame += f"\nShowing cells {first}-{last} of {viewport.length}\n"
 
         yield frame
 
@@ -197,9 +290,22 @@ def display_animation(
     delay: float = 0.1,
     start: int = 0,
     end: int = -1,
+    delta: bool = False,
+    width: Optional[int] = None,
 ) -> None:
-    for frame in generate_animation(arrays, logger, start, end):
-        print(frame)
+    """
+    Play the animation in the terminal. If 'delta' is True, only the
+    characters which change are redrawn each frame (rather than clearing the
+    screen and redrawing everything), greatly reducing the output produced.
+    See :py:func:`generate_animation` for 'width'.
+    """
+    encoder = DeltaEncoder()
+    for frame in generate_animation(arrays, logger, start, end, width):
+        if delta:
+            sys.stdout.write(encoder.encode(frame))
+            sys.stdout.flush()
+        else:
+            print(CLEAR_SCREEN + frame)
         time.sleep(delay)
 
 
@@ -209,40 +315,35 @@ def generate_terminalizer_animation(
     delay: float = 0.1,
     start: int = 0,
     end: int = -1,
+    out: TextIO = sys.stdout,
+    width: Optional[int] = None,
 ) -> None:
-    first_frame = next(iter(generate_animation(arrays, logger, start, end)))
-    lines = first_frame.splitlines()
-    num_rows = len(lines) + 1
-    num_cols = len(lines[0])
-
-    print(
-        dedent(
-            f"""
-            config:
-              cols: {num_cols}
-              rows: {num_rows}
-              repeat: 0
-              quality: 100
-              frameDelay: auto
-              maxIdleTime: 2000
-              frameBox:
-                type: null
-                title: null
-                style: []
-              watermark:
-                imagePath: null
-              fontFamily: "Monaco, Lucida Console, Ubuntu Mono, Monospace"
-              fontSize: 12
-              theme:
-                background: "#000000"
-        """
-        ).strip()
+    write_terminalizer(
+        generate_animation(arrays, logger, start, end, width), out, delay
     )
-    print("records:")
-    for i, frame in enumerate(generate_animation(arrays, logger, start, end)):
-        frame = frame.replace("\n", "\r\n")
-        print(f" - delay: {int((delay if i != 0 else 0)*1000)}")
-        print(f"   content: {json.dumps(frame)}")
+
+
+def generate_asciicast_animation(
+    arrays: List[LoggingLazyList[int]],
+    logger: AccessLogger,
+    delay: float = 0.1,
+    start: int = 0,
+    end: int = -1,
+    out: TextIO = sys.stdout,
+    delta: bool = True,
+    width: Optional[int] = None,
+) -> None:
+    write_asciicast(
+        generate_animation(arrays, logger, start, end, width), out, delay, delta
+    )
+
+
+SAMPLE_FORMAT_NAMES = ["int16", "int32"]
+"""
+The raw sample formats supported by --transform. (NB: These are the keys of
+:py:data:`raw_sample_io.SAMPLE_FORMATS`, which isn't imported unless needed
+since it requires NumPy.)
+"""
 
 
 def parse_wavelet(value: str) -> WaveletFilters:
@@ -290,6 +391,18 @@ if __name__ == "__main__":
         """,
     )
 
+    parser.add_argument(
+        "--page-size",
+        "-p",
+        type=int,
+        default=1,
+        help="""
+            Number of values computed, logged and drawn together. Larger pages
+            make tracing and animating very long signals much cheaper, at the
+            expense of detail. Default: %(default)s.
+        """,
+    )
+
     parser.add_argument(
         "--delay",
         "-d",
@@ -303,7 +416,7 @@ if __name__ == "__main__":
     parser.add_argument(
         "--order",
         "-o",
-        choices=["block", "chained", "lazy", "lazy_two_steps"],
+        choices=list(ORDERS),
         default="block",
         help="""
             Computation order. Default: %(default)s. 'block' = compute each stage
@@ -316,15 +429,154 @@ if __name__ == "__main__":
         """,
     )
 
+    parser.add_argument(
+        "--start",
+        type=int,
+        default=0,
+        help="""
+            Timestep to start the animation at. Default: %(default)s.
+        """,
+    )
+
+    parser.add_argument(
+        "--end",
+        type=int,
+        default=-1,
+        help="""
+            Timestep to end the animation at (exclusive), or -1 to play to the
+            end. Default: %(default)s.
+        """,
+    )
+
+    parser.add_argument(
+        "--viewport",
+        "-V",
+        type=int,
+        nargs="?",
+        const=0,
+        metavar="COLUMNS",
+        help="""
+            Only draw as many cells as fit in COLUMNS characters (default:
+            the width of the terminal), scrolling to follow the computation in
+            progress. Useful for long signals.
+        """,
+    )
+
+    parser.add_argument(
+        "--logger",
+        "-l",
+        choices=["records", "compact"],
+        default="records",
+        help="""
+            Access log storage. Default: %(default)s. 'records' = store each
+            call and access as a Python object. 'compact' = store calls and
+            accesses in compact columnar arrays (uses far less memory for long
+            signals).
+        """,
+    )
+
     parser.add_argument(
         "--display",
         "-D",
         default="terminal",
-        choices=["terminal", "terminalizer"],
+        choices=["terminal", "terminalizer", "asciicast"],
         help="""
             Output display mode. Default: %(default)s. 'terminal' = play animation
             directly in the terminal. 'terminalizer' = output YAML file suitable
             for rendering by the 'terminalizer' GIF generation tool.
+            'asciicast' = output an asciicast v2 recording (for asciinema).
+        """,
+    )
+
+    parser.add_argument(
+        "--output",
+        "-O",
+        help="""
+            File to write 'terminalizer' or 'asciicast' output to. Default:
+            stdout.
+        """,
+    )
+
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="""
+            When playing the animation in the terminal (or exporting an
+            asciicast), only redraw the parts of each frame which changed
+            rather than redrawing the whole frame. Greatly reduces the output
+            produced (e.g. over slow links).
+        """,
+    )
+
+    parser.add_argument(
+        "--save-trace",
+        metavar="FILE",
+        help="""
+            Instead of displaying the animation, save the trace (and array
+            values) to FILE for later display using --load-trace.
+        """,
+    )
+
+    parser.add_argument(
+        "--load-trace",
+        metavar="FILE",
+        help="""
+            Display a trace previously saved using --save-trace rather than
+            computing a new one. (The --wavelet, --input, --num-values,
+            --page-size, --order and --logger arguments are ignored.)
+        """,
+    )
+
+    parser.add_argument(
+        "--transform",
+        "-t",
+        nargs=2,
+        metavar=("INPUT", "OUTPUT"),
+        help="""
+            Instead of animating, transform the raw samples in the INPUT file
+            and write the result to the OUTPUT file. Files are memory mapped
+            and processed in chunks so arbitrarily large files may be
+            transformed.
+        """,
+    )
+
+    parser.add_argument(
+        "--direction",
+        choices=["analysis", "synthesis"],
+        default="analysis",
+        help="""
+            For --transform, whether to perform an analysis (encode) or a
+            synthesis (decode). Default: %(default)s.
+        """,
+    )
+
+    parser.add_argument(
+        "--sample-format",
+        choices=SAMPLE_FORMAT_NAMES,
+        default="int16",
+        help="""
+            For --transform, the format of the (little-endian) samples in the
+            INPUT file. Default: %(default)s.
+        """,
+    )
+
+    parser.add_argument(
+        "--output-format",
+        choices=SAMPLE_FORMAT_NAMES,
+        default="int32",
+        help="""
+            For --transform, the format of the (little-endian) samples written
+            to the OUTPUT file. Default: %(default)s.
+        """,
+    )
+
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1 << 20,
+        help="""
+            For --transform, the number of samples to process at once.
+            Default: %(default)s.
         """,
     )
 
@@ -332,31 +584,97 @@ if __name__ == "__main__":
 
     wavelet: WaveletFilters = parse_wavelet(args.wavelet)
 
-    input_values: List[int]
-    if args.input == "ascending":
-        input_values = list(range(args.num_values))
-    elif args.input == "random":
-        input_values = [random.randrange(100) for _ in range(args.num_values)]
-    else:
-        raise NotImplementedError(args.input)
-
-    logger = AccessLogger()
-    arrays = construct_all_arrays(input_values, wavelet, logger)
-
-    if args.order == "block":
-        access_like_block_filter(arrays, wavelet)
-    elif args.order == "chained":
-        access_like_chained_filters(arrays, wavelet)
-    elif args.order == "lazy":
-        access_on_demand(arrays, wavelet)
-    elif args.order == "lazy_two_steps":
-        access_on_demand_encode_then_decode(arrays, wavelet)
+    if args.transform is not None:
+        # NB: Imported here since (unlike the animator) this requires NumPy
+        from raw_sample_io import transform_file
+
+        input_filename, output_filename = args.transform
+        transform_file(
+            input_filename,
+            output_filename,
+            (
+                ANALYSIS_FILTERS[wavelet]
+                if args.direction == "analysis"
+                else SYNTHESIS_FILTERS[wavelet]
+            ),
+            args.sample_format,
+            args.output_format,
+            args.chunk_size,
+        )
+        sys.exit(0)
+
+    arrays: List[LoggingLazyList[int]]
+    logger: AccessLogger
+    if args.load_trace is not None:
+        arrays, logger = load_trace(args.load_trace)
     else:
-        raise NotImplementedError(args.order)
+        input_values: List[int]
+        if args.input == "ascending":
+            input_values = list(range(args.num_values))
+        elif args.input == "random":
+            input_values = [random.randrange(100) for _ in range(args.num_values)]
+        else:
+            raise NotImplementedError(args.input)
+
+        if args.logger == "records":
+            logger = AccessLogger()
+        elif args.logger == "compact":
+            logger = CompactAccessLogger()
+        else:
+            raise NotImplementedError(args.logger)
+
+        arrays = construct_all_arrays(input_values, wavelet, logger, args.page_size)
+
+        ORDERS[args.order](arrays, wavelet)
+
+    if args.save_trace is not None:
+        save_trace(args.save_trace, arrays, logger)
+        sys.exit(0)
+
+    width: Optional[int] = args.viewport
+    if width == 0:
+        width = shutil.get_terminal_size().columns
 
     if args.display == "terminal":
-        display_animation(arrays, logger, args.delay)
-    elif args.display == "terminalizer":
-        generate_terminalizer_animation(arrays, logger, args.delay)
+        display_animation(
+            arrays,
+            logger,
+            args.delay,
+            args.start,
+            args.end,
+            delta=args.delta,
+            width=width,
+        )
     else:
-        raise NotImplementedError(args.display)
+        out = (
+            open(args.output, "w", buffering=1024 * 1024)
+            if args.output is not None
+            else sys.stdout
+        )
+        try:
+            if args.display == "terminalizer":
+                generate_terminalizer_animation(
+                    arrays,
+                    logger,
+                    args.delay,
+                    args.start,
+                    args.end,
+                    out=out,
+                    width=width,
+                )
+            elif args.display == "asciicast":
+                generate_asciicast_animation(
+                    arrays,
+                    logger,
+                    args.delay,
+                    args.start,
+                    args.end,
+                    out=out,
+                    delta=args.delta,
+                    width=width,
+                )
+            else:
+                raise NotImplementedError(args.display)
+        finally:
+            if out is not sys.stdout:
+                out.close()
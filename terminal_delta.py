@@ -0,0 +1,99 @@
+"""
+Delta encoding of animation frames for display on an ANSI terminal.
+
+Rather than clearing the screen and redrawing every frame in its entirety, a
+:py:class:`DeltaEncoder` compares each frame with the previous one and
+produces only the cursor movements and characters required to update the
+parts of the screen which changed.
+"""
+
+from typing import List, Sequence, Tuple
+
+
+CLEAR_SCREEN = "\033[2J\033[H"
+"""ANSI escape sequence which clears the screen and homes the cursor."""
+
+CLEAR_TO_END_OF_LINE = "\033[K"
+
+
+def move_cursor(row: int, col: int) -> str:
+    """ANSI escape sequence to move to a (zero-indexed) row and column."""
+    return f"\033[{row + 1};{col + 1}H"
+
+
+def changed_spans(old: str, new: str, min_gap: int = 8) -> List[Tuple[int, int]]:
+    """
+    Find the (start, end) spans of characters in 'new' which differ from
+    'old'. Spans separated by fewer than 'min_gap' unchanged characters are
+    merged since redrawing a few unchanged characters is cheaper than moving
+    the cursor.
+    """
+    spans: List[Tuple[int, int]] = []
+    start = None
+    for i in range(len(new)):
+        if i < len(old) and old[i] == new[i]:
+            if start is not None:
+                spans.append((start, i))
+                start = None
+        elif start is None:
+            start = i
+    if start is not None:
+        spans.append((start, len(new)))
+
+    merged: List[Tuple[int, int]] = []
+    for start, end in spans:
+        if merged and start - merged[-1][1] < min_gap:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def frame_delta(old_lines: Sequence[str], new_lines: Sequence[str]) -> str:
+    """
+    Produce the ANSI output which transforms a screen showing 'old_lines'
+    into one showing 'new_lines'.
+    """
+    out = []
+    for row in range(max(len(old_lines), len(new_lines))):
+        old = old_lines[row] if row < len(old_lines) else ""
+        new = new_lines[row] if row < len(new_lines) else ""
+        if old == new:
+            continue
+
+        for start, end in changed_spans(old, new):
+            out.append(move_cursor(row, start) + new[start:end])
+
+        if len(new) < len(old):
+            out.append(move_cursor(row, len(new)) + CLEAR_TO_END_OF_LINE)
+
+    if out:
+        # Leave the cursor below the frame
+        out.append(move_cursor(len(new_lines), 0))
+
+    return "".join(out)
+
+
+class DeltaEncoder:
+    """
+    Converts a series of frames into a series of ANSI terminal updates. The
+    first frame clears the screen, subsequent frames update only the
+    characters which changed.
+    """
+
+    _previous_lines: List[str]
+    _first: bool
+
+    def __init__(self) -> None:
+        self._previous_lines = []
+        self._first = True
+
+    def encode(self, frame: str) -> str:
+        lines = frame.splitlines()
+        if self._first:
+            self._first = False
+            out = CLEAR_SCREEN + "\n".join(lines) + "\n"
+        else:
+            out = frame_delta(self._previous_lines, lines)
+        self._previous_lines = lines
+        return out
@@ -0,0 +1,175 @@
+"""
+Tiled lifting transforms which split long signals into independently
+transformed tiles, for example to spread work across multiple processes.
+
+Each tile is extended by a 'halo' of neighbouring samples on either side so
+that the values in its core are computed from exactly the same inputs as in a
+single-pass transform. The halo width is derived from the support of the
+lifting stages (see :py:func:`halo_width`): values near the edge of an
+extended tile may be computed incorrectly (due to edge clamping), but the
+error can't propagate further than the halo width. The cores of each tile are
+then stitched together, giving results bit-for-bit identical to the
+single-pass transform.
+"""
+
+from typing import Any, List, Iterator, NamedTuple, Optional, Tuple
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+from contextlib import ExitStack
+
+import numpy as np
+
+from vc2_wavelet_definitions import (
+    WaveletFilters,
+    LiftingStage,
+    ANALYSIS_FILTERS,
+    SYNTHESIS_FILTERS,
+)
+
+from numpy_lifting import (
+    ArrayLike,
+    apply_lifting_stages,
+    analysis_range,
+    dtype_range,
+    output_dtype,
+)
+
+from lifting_analysis import SignalRange, bit_depth_range, tap_offsets
+
+
+def halo_width(stages: List[LiftingStage]) -> int:
+    """
+    Compute the number of samples by which a tile must be extended on each
+    side for its core to be computed correctly by a chain of lifting stages.
+
+    Each stage may produce incorrect values (due to edge clamping) up to the
+    reach of its furthest tap (plus one sample due to clamping to the nearest
+    sample of the opposite parity) from the end of the tile, and may spread
+    incorrect values it receives by the same amount. The halo is rounded up
+    to an even number of samples so that the parity of each sample within a
+    tile matches its parity in the complete signal.
+    """
+    width = 0
+    for stage in stages:
+        width += max(abs(offset) for offset in tap_offsets(stage)) + 2
+    return width + (width % 2)
+
+
+class Tile(NamedTuple):
+    """A tile of a signal, along with its halo."""
+
+    start: int
+    stop: int
+    """The core of the tile (which this tile is responsible for computing)."""
+
+    extended_start: int
+    extended_stop: int
+    """The extent of the tile including its halo."""
+
+
+def iter_tiles(length: int, tile_size: int, halo: int) -> Iterator[Tile]:
+    """
+    Split a signal of the given length into tiles. The tile size is rounded
+    up to a multiple of two so that every tile starts on an even sample.
+    """
+    tile_size += tile_size % 2
+    for start in range(0, length, tile_size):
+        stop = min(start + tile_size, length)
+        yield Tile(start, stop, max(0, start - halo), min(length, stop + halo))
+
+
+def transform_tile(
+    values: np.ndarray,
+    tile: Tile,
+    stages: List[LiftingStage],
+    input_range: Optional[SignalRange] = None,
+) -> np.ndarray:
+    """
+    Apply a chain of lifting stages to the values within an (extended) tile,
+    returning the transformed core of the tile.
+
+    'values' should contain the samples from tile.extended_start to
+    tile.extended_stop. See :py:func:`numpy_lifting.apply_lifting_stages` for
+    'input_range'.
+    """
+    out = apply_lifting_stages(values, stages, input_range=input_range)
+    return out[tile.start - tile.extended_start : tile.stop - tile.extended_start]
+
+
+def _transform_tile_job(
+    job: Tuple[np.ndarray, Tile, List[LiftingStage], Optional[SignalRange]]
+) -> np.ndarray:
+    return transform_tile(*job)
+
+
+def tiled_lifting(
+    values: ArrayLike,
+    stages: List[LiftingStage],
+    tile_size: int = 1 << 18,
+    executor: Optional[Executor] = None,
+    max_workers: Optional[int] = None,
+    input_range: Optional[SignalRange] = None,
+) -> np.ndarray:
+    """
+    Apply a chain of lifting stages to a (1D) signal, tile by tile, in
+    parallel.
+
+    Tiles are transformed using the supplied :py:class:`Executor`, or, if
+    none is given, a new :py:class:`ProcessPoolExecutor` with the specified
+    number of workers. See :py:func:`numpy_lifting.apply_lifting_stages` for
+    'input_range'.
+    """
+    values = np.asarray(values)
+    halo = halo_width(stages)
+    tiles = list(iter_tiles(len(values), tile_size, halo))
+    jobs = (
+        (values[tile.extended_start : tile.extended_stop], tile, stages, input_range)
+        for tile in tiles
+    )
+
+    out_dtype = output_dtype(
+        stages, input_range if input_range is not None else dtype_range(values.dtype)
+    )
+    out = np.empty(values.shape, dtype=out_dtype)
+    with ExitStack() as stack:
+        if executor is None:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers))
+        for tile, result in zip(tiles, executor.map(_transform_tile_job, jobs)):
+            out[tile.start : tile.stop] = result
+
+    return out
+
+
+def tiled_analyse(
+    values: ArrayLike,
+    wavelet: WaveletFilters,
+    tile_size: int = 1 << 18,
+    bit_depth: Optional[int] = None,
+    **kwargs: Any,
+) -> np.ndarray:
+    """
+    Perform a single-level wavelet analysis (encode) in parallel. See
+    :py:func:`tiled_lifting` and :py:func:`numpy_lifting.analyse` for
+    arguments.
+    """
+    if bit_depth is not None:
+        kwargs["input_range"] = bit_depth_range(bit_depth)
+    return tiled_lifting(values, ANALYSIS_FILTERS[wavelet], tile_size, **kwargs)
+
+
+def tiled_synthesise(
+    values: ArrayLike,
+    wavelet: WaveletFilters,
+    tile_size: int = 1 << 18,
+    bit_depth: Optional[int] = None,
+    **kwargs: Any,
+) -> np.ndarray:
+    """
+    Perform a single-level wavelet synthesis (decode) in parallel. See
+    :py:func:`tiled_lifting` and :py:func:`numpy_lifting.synthesise` for
+    arguments.
+    """
+    if bit_depth is not None:
+        kwargs["input_range"] = analysis_range(wavelet, bit_depth)
+    return tiled_lifting(values, SYNTHESIS_FILTERS[wavelet], tile_size, **kwargs)
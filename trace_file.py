@@ -0,0 +1,528 @@
+"""
+A compact binary file format for logged traces, allowing a trace to be
+recorded once and then animated or analysed many times without recomputing
+it.
+
+A trace file holds the columns of a
+:py:class:`~compact_access_logger.CompactAccessLogger` (converted from any
+:py:class:`~logging_lazy_lists.AccessLogger` if necessary) along with the
+final values in each array. Array names are interned and every column is
+stored as a sequence of variable length integers (varints), delta coded where
+values tend to increase (e.g. times). A block index records the position of
+(and value preceding) every :py:data:`BLOCK_SIZE`\\th entry of each column so
+that any entry can be found without decoding the column from the start.
+
+:py:func:`load_trace` memory maps the file and returns a read-only
+:py:class:`TraceLogger` (a :py:class:`CompactAccessLogger` whose call and
+access columns are decoded from the file on demand) and pre-populated
+:py:class:`~logging_lazy_lists.LoggingLazyList`\\s which can be passed
+straight to :py:func:`streaming_wavelet_toy.generate_animation` or
+:py:func:`live_set_analysis.analyse_live_set`.
+
+File layout
+-----------
+
+All fixed-width integers are little-endian. The file starts with an 8-byte
+magic number, a uint32 version and a uint32 section count, followed by a
+table of contents giving the name, offset and size of each section. The
+sections are:
+
+* ``meta``: the logger's current time followed by varints giving the
+  interned array names and, for each displayed array, its name ID, length
+  and page size.
+* ``call_array``, ``call_index``, ``call_start``, ``call_end``: the calls.
+* ``access_call``, ``access_array``, ``access_index``, ``access_start``,
+  ``access_end``: the accesses.
+* ``first.<id>``, ``last.<id>``: the first/last access times of each index
+  of each array (by name ID).
+* ``values.<n>``: the final values of the n-th displayed array.
+
+Each column section starts with a header (number of entries, size of the
+encoded data, block size and flags), padded to a multiple of eight bytes,
+followed by the block index (an int64 (offset, previous value) pair per
+block) and the encoded data.
+"""
+
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+    overload,
+)
+
+import mmap
+
+from array import array
+
+import struct
+
+from logging_lazy_lists import (
+    AccessLogger,
+    AccessRecord,
+    LoggingLazyList,
+    Unknown,
+)
+
+from compact_access_logger import CompactAccessLogger, CompactAccessTimes
+
+
+MAGIC = b"VC2TRACE"
+
+VERSION = 1
+
+BLOCK_SIZE = 256
+"""The number of column entries between block index entries."""
+
+_HEADER = struct.Struct("<8sII")
+_TOC_ENTRY = struct.Struct("<QQ")
+_COLUMN_HEADER = struct.Struct("<QQII")
+_INDEX_ENTRY = struct.Struct("<qq")
+
+_DELTA = 1
+"""Column flag: each value is stored relative to the previous one."""
+
+_OPTIONAL = 2
+"""Column flag: the column may contain None (stored as zero)."""
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: Union[bytes, memoryview], pos: int) -> Tuple[int, int]:
+    """Returns (value, position after value)."""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return (value, pos)
+        shift += 7
+
+
+def _encode_column(values: Sequence[Optional[int]], flags: int) -> bytes:
+    data = bytearray()
+    index = bytearray()
+    previous = 0
+    for i, value in enumerate(values):
+        if i % BLOCK_SIZE == 0:
+            index += _INDEX_ENTRY.pack(len(data), previous)
+        if value is None:
+            _write_varint(data, 0)
+            continue
+        if flags & _DELTA:
+            encoded = _zigzag(value - previous)
+            previous = value
+        else:
+            encoded = _zigzag(value)
+        _write_varint(data, encoded + 1 if flags & _OPTIONAL else encoded)
+
+    header = _COLUMN_HEADER.pack(len(values), len(data), BLOCK_SIZE, flags)
+    return header + index + bytes(data)
+
+
+class VarintColumn(Sequence[Optional[int]]):
+    """
+    A read-only view of a column of values in a trace file, decoded a block
+    at a time as needed.
+    """
+
+    _data: memoryview
+    _index: memoryview
+    """The encoded values and the block index (offset, previous value)."""
+
+    _length: int
+    _block_size: int
+    _flags: int
+
+    _cached_block: int
+    _cached_values: List[Optional[int]]
+    """The most recently decoded block."""
+
+    def __init__(self, section: memoryview) -> None:
+        length, data_size, block_size, flags = _COLUMN_HEADER.unpack_from(section)
+        num_blocks = -(-length // block_size)
+        index_start = _COLUMN_HEADER.size
+        data_start = index_start + (num_blocks * _INDEX_ENTRY.size)
+
+        self._length = length
+        self._block_size = block_size
+        self._flags = flags
+        self._index = section[index_start:data_start].cast("q")
+        self._data = section[data_start : data_start + data_size]
+
+        self._cached_block = -1
+        self._cached_values = []
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _decode(self, block: int, count: int) -> List[Optional[int]]:
+        """Decode 'count' values starting at the start of the given block."""
+        end_block = block - (-count // self._block_size)
+        start = self._index[2 * block]
+        if 2 * end_block < len(self._index):
+            stop = self._index[2 * end_block]
+        else:
+            stop = len(self._data)
+        data = bytes(self._data[start:stop])
+        previous = self._index[(2 * block) + 1]
+        delta = self._flags & _DELTA
+        optional = self._flags & _OPTIONAL
+
+        values: List[Optional[int]] = []
+        pos = 0
+        for _ in range(count):
+            encoded = data[pos]
+            if encoded < 0x80:
+                pos += 1
+            else:
+                encoded, pos = _read_varint(data, pos)
+            if optional:
+                if encoded == 0:
+                    values.append(None)
+                    continue
+                encoded -= 1
+            value = (encoded >> 1) ^ -(encoded & 1)
+            if delta:
+                value += previous
+                previous = value
+            values.append(value)
+        return values
+
+    def _block(self, block: int) -> List[Optional[int]]:
+        if block != self._cached_block:
+            start = block * self._block_size
+            self._cached_values = self._decode(
+                block, min(self._block_size, self._length - start)
+            )
+            self._cached_block = block
+        return self._cached_values
+
+    @overload
+    def __getitem__(self, index: int) -> Optional[int]:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Optional[int]]:
+        ...
+
+    def __getitem__(self, index):  # type: ignore
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        block, offset = divmod(index, self._block_size)
+        return self._block(block)[offset]
+
+    def __iter__(self) -> Iterator[Optional[int]]:
+        return iter(self._decode(0, self._length) if self._length else [])
+
+    def iter_required(self) -> Iterator[int]:
+        """
+        Iterate over the values of a column which cannot contain None (i.e.
+        one written without the optional flag).
+        """
+        if self._flags & _OPTIONAL:
+            raise ValueError("Column may contain None.")
+        values = self._decode(0, self._length) if self._length else []
+        return iter(cast(List[int], values))
+
+
+_Columns = Tuple[
+    List[str], Mapping[str, Sequence[int]], List["array[int]"], List["array[int]"]
+]
+
+
+def _logger_columns(logger: AccessLogger) -> _Columns:
+    """
+    Get the interned array names, call and access columns and (per array
+    name) first/last access time columns of a logger.
+    """
+    if isinstance(logger, CompactAccessLogger):
+        return (
+            list(logger._array_names),
+            {
+                "call_array": logger._call_array,
+                "call_index": logger._call_index,
+                "call_start": logger._call_start,
+                "call_end": logger._call_end,
+                "access_call": logger._access_call,
+                "access_array": logger._access_array,
+                "access_index": logger._access_index,
+                "access_start": logger._access_start,
+                "access_end": logger._access_end,
+            },
+            list(logger._first_times),
+            list(logger._last_times),
+        )
+
+    # Convert an AccessLogger's records into columns. (NB: AccessLoggers only
+    # record the accesses made within calls.)
+    names: List[str] = []
+    ids: Dict[str, int] = {}
+
+    def intern(name: str) -> int:
+        if name not in ids:
+            ids[name] = len(names)
+            names.append(name)
+        return ids[name]
+
+    columns: Dict[str, List[int]] = {
+        name: []
+        for name in [
+            "call_array",
+            "call_index",
+            "call_start",
+            "call_end",
+            "access_call",
+            "access_array",
+            "access_index",
+            "access_start",
+            "access_end",
+        ]
+    }
+    accesses: List[Tuple[AccessRecord, int]] = []
+    for call_id, call in enumerate(logger.call_log):
+        columns["call_array"].append(intern(call.array_name))
+        columns["call_index"].append(call.index)
+        columns["call_start"].append(call.start_time)
+        columns["call_end"].append(call.end_time if call.end_time is not None else -1)
+        accesses.extend((access, call_id) for access in call.access_log)
+    accesses.sort(key=lambda access_call: access_call[0].start_time)
+    for access, call_id in accesses:
+        columns["access_call"].append(call_id)
+        columns["access_array"].append(intern(access.array_name))
+        columns["access_index"].append(access.index)
+        columns["access_start"].append(access.start_time)
+        columns["access_end"].append(
+            access.end_time if access.end_time is not None else -1
+        )
+
+    first_times: List["array[int]"] = []
+    last_times: List["array[int]"] = []
+    for access_times, times_columns in [
+        (logger.first_access_time, first_times),
+        (logger.last_access_time, last_times),
+    ]:
+        for (array_name, index), time in access_times.items():
+            array_id = intern(array_name)
+            while len(times_columns) <= array_id:
+                times_columns.append(array("q"))
+            times = times_columns[array_id]
+            if index >= len(times):
+                times.extend(array("q", [-1]) * (index + 1 - len(times)))
+            times[index] = time
+    for times_columns in (first_times, last_times):
+        while len(times_columns) < len(names):
+            times_columns.append(array("q"))
+
+    return (names, columns, first_times, last_times)
+
+
+_COLUMN_FLAGS = {
+    "call_array": 0,
+    "call_index": 0,
+    "call_start": _DELTA,
+    "call_end": _DELTA,
+    "access_call": _DELTA,
+    "access_array": 0,
+    "access_index": 0,
+    "access_start": _DELTA,
+    "access_end": _DELTA,
+}
+
+
+def write_trace(
+    f: BinaryIO, arrays: Sequence[LoggingLazyList[int]], logger: AccessLogger,
+) -> None:
+    """Write the trace in a logger, along with the arrays' values, to a file."""
+    names, columns, first_times, last_times = _logger_columns(logger)
+    for lazy_list in arrays:
+        if lazy_list.name not in names:
+            names.append(lazy_list.name)
+            first_times.append(array("q"))
+            last_times.append(array("q"))
+
+    meta = bytearray()
+    _write_varint(meta, logger._time)
+    _write_varint(meta, len(names))
+    for name in names:
+        encoded = name.encode("utf-8")
+        _write_varint(meta, len(encoded))
+        meta += encoded
+    _write_varint(meta, len(arrays))
+    for lazy_list in arrays:
+        _write_varint(meta, names.index(lazy_list.name))
+        _write_varint(meta, len(lazy_list))
+        _write_varint(meta, lazy_list.page_size)
+
+    sections: List[Tuple[str, bytes]] = [("meta", bytes(meta))]
+    for name, flags in _COLUMN_FLAGS.items():
+        sections.append((name, _encode_column(columns[name], flags)))
+    for array_id, (first, last) in enumerate(zip(first_times, last_times)):
+        sections.append((f"first.{array_id}", _encode_column(first, _DELTA)))
+        sections.append((f"last.{array_id}", _encode_column(last, _DELTA)))
+    for n, lazy_list in enumerate(arrays):
+        values = [
+            None if isinstance(value, Unknown) else value
+            for value in lazy_list.iter_current_values()
+        ]
+        sections.append((f"values.{n}", _encode_column(values, _OPTIONAL)))
+
+    # Table of contents
+    toc = bytearray()
+    for name, _ in sections:
+        encoded = name.encode("utf-8")
+        _write_varint(toc, len(encoded))
+        toc += encoded
+    toc_size = len(toc) + (len(sections) * _TOC_ENTRY.size)
+    offset = _HEADER.size + toc_size
+    for _, data in sections:
+        offset += -offset % 8
+        toc += _TOC_ENTRY.pack(offset, len(data))
+        offset += len(data)
+
+    f.write(_HEADER.pack(MAGIC, VERSION, len(sections)))
+    f.write(toc)
+    offset = _HEADER.size + toc_size
+    for _, data in sections:
+        f.write(bytes(-offset % 8))
+        offset += -offset % 8
+        f.write(data)
+        offset += len(data)
+
+
+def save_trace(
+    filename: str, arrays: Sequence[LoggingLazyList[int]], logger: AccessLogger,
+) -> None:
+    """Save a trace (see :py:func:`write_trace`) to the named file."""
+    with open(filename, "wb") as f:
+        write_trace(f, arrays, logger)
+
+
+class TraceLogger(CompactAccessLogger):
+    """
+    A read-only :py:class:`CompactAccessLogger` whose columns are views of a
+    trace file (see :py:func:`load_trace`).
+    """
+
+    def __init__(
+        self,
+        time: int,
+        names: List[str],
+        columns: Dict[str, VarintColumn],
+        first_times: List["array[int]"],
+        last_times: List["array[int]"],
+    ) -> None:
+        # NB: CompactAccessLogger.__init__ is deliberately not called since
+        # every column it creates is replaced.
+        self._time = time
+
+        self._array_names = names
+        self._array_ids = {name: array_id for array_id, name in enumerate(names)}
+
+        for name, column in columns.items():
+            setattr(self, f"_{name}", column)
+        self._call_id_stack = []
+
+        self._first_times = first_times
+        self._last_times = last_times
+
+        self._accesses_by_call = None
+
+        self.first_access_time = CompactAccessTimes(self, self._first_times)
+        self.last_access_time = CompactAccessTimes(self, self._last_times)
+
+    def begin_call(self, array_name: str, index: int) -> Any:
+        raise TypeError("Loaded traces are read-only.")
+
+    def begin_access(self, array_name: str, index: int) -> Any:
+        raise TypeError("Loaded traces are read-only.")
+
+
+def _read_times(section: memoryview) -> "array[int]":
+    return array("q", VarintColumn(section).iter_required())
+
+
+def load_trace(
+    filename: str,
+) -> Tuple[List[LoggingLazyList[int]], TraceLogger]:
+    """
+    Memory map a trace file written by :py:func:`save_trace`, returning the
+    arrays (pre-populated with their final values) and the logger.
+    """
+    with open(filename, "rb") as f:
+        data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    magic, version, num_sections = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{filename} is not a trace file.")
+    if version != VERSION:
+        raise ValueError(f"Unsupported trace file version {version}.")
+
+    pos = _HEADER.size
+    section_names = []
+    for _ in range(num_sections):
+        length, pos = _read_varint(data, pos)
+        section_names.append(bytes(data[pos : pos + length]).decode("utf-8"))
+        pos += length
+    sections: Dict[str, memoryview] = {}
+    for name in section_names:
+        offset, size = _TOC_ENTRY.unpack_from(data, pos)
+        pos += _TOC_ENTRY.size
+        sections[name] = data[offset : offset + size]
+
+    meta = sections["meta"]
+    time, pos = _read_varint(meta, 0)
+    num_names, pos = _read_varint(meta, pos)
+    names = []
+    for _ in range(num_names):
+        length, pos = _read_varint(meta, pos)
+        names.append(bytes(meta[pos : pos + length]).decode("utf-8"))
+        pos += length
+
+    logger = TraceLogger(
+        time,
+        names,
+        {name: VarintColumn(sections[name]) for name in _COLUMN_FLAGS},
+        # NB: The (per array index) access times are decoded up-front since
+        # they are small and, unlike the calls and accesses, typically read in
+        # their entirety in random order.
+        [_read_times(sections[f"first.{i}"]) for i in range(num_names)],
+        [_read_times(sections[f"last.{i}"]) for i in range(num_names)],
+    )
+
+    num_arrays, pos = _read_varint(meta, pos)
+    arrays: List[LoggingLazyList[int]] = []
+    for n in range(num_arrays):
+        array_id, pos = _read_varint(meta, pos)
+        length, pos = _read_varint(meta, pos)
+        page_size, pos = _read_varint(meta, pos)
+        values = [
+            Unknown() if value is None else value
+            for value in VarintColumn(sections[f"values.{n}"])
+        ]
+        assert len(values) == length
+        arrays.append(LoggingLazyList(names[array_id], values, logger, page_size))
+
+    return (arrays, logger)
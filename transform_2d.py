@@ -0,0 +1,140 @@
+"""
+Two-dimensional separable wavelet transforms for pictures.
+
+As in VC-2, analysis applies the lifting filters horizontally (along each row)
+followed by vertically (along each column) while synthesis applies them
+vertically and then horizontally. In both cases the transformed picture is
+returned with its subbands interleaved (i.e. in-place).
+
+Block (:py:func:`analyse_2d` and :py:func:`synthesise_2d`) and line-based
+streaming (:py:class:`StreamingLineAnalysis` and
+:py:class:`StreamingLineSynthesis`) implementations are provided. The
+streaming variants accept rows in raster order and retain only as many rows as
+required by the vertical filters' support.
+"""
+
+from typing import List, Iterable, Iterator
+
+import numpy as np
+
+from vc2_wavelet_definitions import (
+    WaveletFilters,
+    ANALYSIS_FILTERS,
+    SYNTHESIS_FILTERS,
+)
+
+from numpy_lifting import ArrayLike, analyse, synthesise
+
+from streaming_lifting import StreamingLiftingChain
+
+
+def analyse_2d(picture: ArrayLike, wavelet: WaveletFilters) -> np.ndarray:
+    """
+    Perform a single-level 2D wavelet analysis of a picture (a 2D array
+    indexed as [row, column]).
+    """
+    return analyse(analyse(picture, wavelet, axis=1), wavelet, axis=0)
+
+
+def synthesise_2d(coeffs: ArrayLike, wavelet: WaveletFilters) -> np.ndarray:
+    """
+    Perform a single-level 2D wavelet synthesis of a picture's (interleaved)
+    transform coefficients.
+    """
+    return synthesise(synthesise(coeffs, wavelet, axis=0), wavelet, axis=1)
+
+
+class StreamingLineAnalysis:
+    """
+    A line-based streaming 2D wavelet analysis.
+
+    Rows of the picture are fed in, in raster order, using :py:meth:`push` and
+    the end of the picture signalled with :py:meth:`flush`. Both return the
+    list of (interleaved) coefficient rows which became available.
+    """
+
+    vertical: StreamingLiftingChain[np.ndarray]
+
+    def __init__(self, wavelet: WaveletFilters) -> None:
+        self.wavelet = wavelet
+        self.vertical = StreamingLiftingChain(ANALYSIS_FILTERS[wavelet])
+
+    @property
+    def rows_buffered(self) -> int:
+        """The (maximum) number of rows held in memory at once."""
+        return self.vertical.buffer_length
+
+    def push(self, row: ArrayLike) -> List[np.ndarray]:
+        """
+        Add the next row of the picture. Returns the coefficient rows which
+        have become available.
+        """
+        row = np.asarray(row, dtype=np.int64)
+        return self.vertical.push(analyse(row, self.wavelet))
+
+    def flush(self) -> List[np.ndarray]:
+        """
+        Signal the end of the picture. Returns all remaining coefficient rows.
+        """
+        return self.vertical.flush()
+
+
+class StreamingLineSynthesis:
+    """
+    A line-based streaming 2D wavelet synthesis.
+
+    Rows of (interleaved) coefficients are fed in, in raster order, using
+    :py:meth:`push` and the end of the picture signalled with :py:meth:`flush`.
+    Both return the list of picture rows which became available.
+    """
+
+    vertical: StreamingLiftingChain[np.ndarray]
+
+    def __init__(self, wavelet: WaveletFilters) -> None:
+        self.wavelet = wavelet
+        self.vertical = StreamingLiftingChain(SYNTHESIS_FILTERS[wavelet])
+
+    @property
+    def rows_buffered(self) -> int:
+        """The (maximum) number of rows held in memory at once."""
+        return self.vertical.buffer_length
+
+    def push(self, row: ArrayLike) -> List[np.ndarray]:
+        """
+        Add the next row of coefficients. Returns the picture rows which have
+        become available.
+        """
+        row = np.asarray(row, dtype=np.int64)
+        return [synthesise(out, self.wavelet) for out in self.vertical.push(row)]
+
+    def flush(self) -> List[np.ndarray]:
+        """
+        Signal the end of the picture. Returns all remaining picture rows.
+        """
+        return [synthesise(out, self.wavelet) for out in self.vertical.flush()]
+
+
+def stream_analysis_2d(
+    rows: Iterable[ArrayLike], wavelet: WaveletFilters
+) -> Iterator[np.ndarray]:
+    """
+    Perform a line-based streaming 2D wavelet analysis, yielding coefficient
+    rows as soon as they can be computed.
+    """
+    analysis = StreamingLineAnalysis(wavelet)
+    for row in rows:
+        yield from analysis.push(row)
+    yield from analysis.flush()
+
+
+def stream_synthesis_2d(
+    rows: Iterable[ArrayLike], wavelet: WaveletFilters
+) -> Iterator[np.ndarray]:
+    """
+    Perform a line-based streaming 2D wavelet synthesis, yielding picture rows
+    as soon as they can be computed.
+    """
+    synthesis = StreamingLineSynthesis(wavelet)
+    for row in rows:
+        yield from synthesis.push(row)
+    yield from synthesis.flush()
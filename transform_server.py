@@ -0,0 +1,414 @@
+"""
+An asyncio server which performs streaming wavelet transforms for many
+concurrent clients.
+
+Each connection carries a single stream of samples. The client sends a
+header choosing the wavelet and direction, followed by frames of samples; the
+server sends back frames of transformed values as soon as the lifting chain
+(see :py:mod:`fused_lifting`) can produce them.
+
+Protocol
+--------
+
+All integers are little-endian.
+
+The client first sends an 8-byte header: the magic bytes ``VC2L``, the
+protocol version (1), the :py:class:`WaveletFilters` value, the direction
+(see :py:data:`DIRECTIONS`) and the (signed) bit depth of the input signal.
+
+Both directions then consist of frames. A frame is a uint32 sample count
+followed by that many int32 samples. A count of zero marks the end of the
+stream. After the client's end of stream, the server sends its remaining
+values, its own end of stream and closes the connection.
+
+If the server encounters an error (e.g. a sample outside of the declared bit
+depth) it sends a frame with a count of 0xFFFFFFFF, followed by a uint32
+length and a UTF-8 error message, and closes the connection.
+
+Backpressure
+------------
+
+The server does not read another frame from a connection until it has handed
+the output for the previous frame to the operating system (i.e.
+:py:meth:`asyncio.StreamWriter.drain` has returned). A client which stops
+reading therefore eventually stops the server reading, which in turn stops
+the client being able to write. Along with the limit on frame sizes, this
+bounds the memory used by each connection.
+"""
+
+from typing import Any, List, Mapping, Optional
+
+import sys
+
+import struct
+
+import asyncio
+
+from functools import partial
+
+from argparse import ArgumentParser
+
+import numpy as np
+
+from vc2_wavelet_definitions import (
+    WaveletFilters,
+    LiftingStage,
+    ANALYSIS_FILTERS,
+    SYNTHESIS_FILTERS,
+)
+
+from lifting_analysis import SignalRange, bit_depth_range, signal_value_range
+
+from numpy_lifting import ArrayLike, analysis_range
+
+from fused_lifting import FusedLiftingChain
+
+
+MAGIC = b"VC2L"
+
+VERSION = 1
+
+DIRECTIONS: Mapping[str, int] = {
+    "analysis": 0,
+    "synthesis": 1,
+    "analysis_then_synthesis": 2,
+}
+"""The transforms which may be requested, by name and protocol value."""
+
+SAMPLE_DTYPE = np.dtype("<i4")
+"""The type of samples sent over the wire."""
+
+DEFAULT_MAX_FRAME_SAMPLES = 1 << 16
+"""The default maximum number of samples in a frame."""
+
+DEFAULT_WRITE_BUFFER_LIMIT = 1 << 20
+"""The default number of bytes of output buffered before pausing."""
+
+_HEADER = struct.Struct("<4sBBBB")
+_COUNT = struct.Struct("<I")
+
+_END_OF_STREAM = 0
+_ERROR = 0xFFFFFFFF
+
+
+class TransformError(Exception):
+    """Raised by the client when the server reports an error."""
+
+
+def _stages(wavelet: WaveletFilters, direction: int) -> List[LiftingStage]:
+    if direction == DIRECTIONS["analysis"]:
+        return ANALYSIS_FILTERS[wavelet]
+    elif direction == DIRECTIONS["synthesis"]:
+        return SYNTHESIS_FILTERS[wavelet]
+    elif direction == DIRECTIONS["analysis_then_synthesis"]:
+        return ANALYSIS_FILTERS[wavelet] + SYNTHESIS_FILTERS[wavelet]
+    else:
+        raise ValueError(f"Unknown direction {direction}.")
+
+
+def _input_range(
+    wavelet: WaveletFilters, direction: int, bit_depth: int
+) -> SignalRange:
+    if direction == DIRECTIONS["synthesis"]:
+        return analysis_range(wavelet, bit_depth)
+    else:
+        return bit_depth_range(bit_depth)
+
+
+async def read_frame(
+    reader: asyncio.StreamReader,
+    max_samples: int = DEFAULT_MAX_FRAME_SAMPLES,
+) -> Optional[np.ndarray]:
+    """
+    Read a frame of samples. Returns None at the end of the stream.
+
+    Raises :py:exc:`TransformError` if an error frame is received and
+    :py:exc:`ValueError` if the frame is larger than 'max_samples'.
+    """
+    (count,) = _COUNT.unpack(await reader.readexactly(_COUNT.size))
+    if count == _ERROR:
+        (length,) = _COUNT.unpack(await reader.readexactly(_COUNT.size))
+        raise TransformError((await reader.readexactly(length)).decode("utf-8"))
+    elif count == _END_OF_STREAM:
+        return None
+    elif count > max_samples:
+        raise ValueError(f"Frame of {count} samples exceeds limit of {max_samples}.")
+    data = await reader.readexactly(count * SAMPLE_DTYPE.itemsize)
+    return np.frombuffer(data, dtype=SAMPLE_DTYPE)
+
+
+def write_frame(writer: asyncio.StreamWriter, samples: np.ndarray) -> None:
+    """Write a (non-empty) frame of samples."""
+    writer.write(_COUNT.pack(len(samples)))
+    writer.write(samples.astype(SAMPLE_DTYPE, copy=False).tobytes())
+
+
+def write_end_of_stream(writer: asyncio.StreamWriter) -> None:
+    writer.write(_COUNT.pack(_END_OF_STREAM))
+
+
+def write_error(writer: asyncio.StreamWriter, message: str) -> None:
+    data = message.encode("utf-8")
+    writer.write(_COUNT.pack(_ERROR) + _COUNT.pack(len(data)) + data)
+
+
+async def handle_connection(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    max_frame_samples: int = DEFAULT_MAX_FRAME_SAMPLES,
+    write_buffer_limit: int = DEFAULT_WRITE_BUFFER_LIMIT,
+) -> None:
+    """Serve a single connection (see the module documentation)."""
+    writer.transport.set_write_buffer_limits(high=write_buffer_limit)
+    try:
+        magic, version, wavelet_value, direction, bit_depth = _HEADER.unpack(
+            await reader.readexactly(_HEADER.size)
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Unsupported protocol.")
+        if not 1 <= bit_depth <= 32:
+            raise ValueError(f"Unsupported bit depth {bit_depth}.")
+        wavelet = WaveletFilters(wavelet_value)
+        input_range = _input_range(wavelet, direction, bit_depth)
+        chain = FusedLiftingChain(_stages(wavelet, direction), input_range)
+
+        lo, hi = signal_value_range(input_range)
+        limits = np.iinfo(SAMPLE_DTYPE)
+        check_output = not np.can_cast(chain.output_dtype, SAMPLE_DTYPE)
+
+        while True:
+            samples = await read_frame(reader, max_frame_samples)
+            if samples is None:
+                out = chain.flush()
+            elif samples.min() < lo or samples.max() > hi:
+                raise ValueError(f"Sample outside of the range {lo} to {hi}.")
+            else:
+                out = chain.push(samples)
+
+            if check_output and len(out):
+                if out.min() < limits.min or out.max() > limits.max:
+                    raise OverflowError("Transformed values do not fit in int32.")
+
+            if len(out):
+                write_frame(writer, out)
+            if samples is None:
+                write_end_of_stream(writer)
+                await writer.drain()
+                break
+
+            # NB: Don't read any more input until the client has accepted the
+            # output produced so far (see 'Backpressure' above).
+            await writer.drain()
+    except (ValueError, OverflowError) as exc:
+        write_error(writer, str(exc))
+    except (asyncio.IncompleteReadError, ConnectionError):
+        # The client went away
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def start_server(
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    path: Optional[str] = None,
+    max_frame_samples: int = DEFAULT_MAX_FRAME_SAMPLES,
+    write_buffer_limit: int = DEFAULT_WRITE_BUFFER_LIMIT,
+) -> asyncio.AbstractServer:
+    """
+    Start a transform server listening on a Unix socket (if 'path' is given)
+    or TCP socket.
+    """
+    handler = partial(
+        handle_connection,
+        max_frame_samples=max_frame_samples,
+        write_buffer_limit=write_buffer_limit,
+    )
+    # NB: Limits the data buffered by each connection's reader
+    limit = (max_frame_samples * SAMPLE_DTYPE.itemsize) + _COUNT.size
+    if path is not None:
+        return await asyncio.start_unix_server(handler, path, limit=limit)
+    else:
+        return await asyncio.start_server(handler, host, port, limit=limit)
+
+
+class TransformClient:
+    """
+    A client for a transform server.
+
+    Samples are sent using :py:meth:`send` and the end of the stream
+    signalled using :py:meth:`end`. Results are read using
+    :py:meth:`receive`. Since sending waits for the server to accept the
+    samples (which, in turn, waits for results to be read), sending and
+    receiving should be performed concurrently (e.g. see
+    :py:func:`transform_samples`).
+    """
+
+    frame_size: int
+    _reader: asyncio.StreamReader
+    _writer: asyncio.StreamWriter
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        frame_size: int = DEFAULT_MAX_FRAME_SAMPLES,
+    ) -> None:
+        self._reader = reader
+        self._writer = writer
+        self.frame_size = frame_size
+
+    @classmethod
+    async def connect(
+        cls,
+        wavelet: WaveletFilters,
+        direction: str = "analysis",
+        bit_depth: int = 16,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        path: Optional[str] = None,
+        frame_size: int = DEFAULT_MAX_FRAME_SAMPLES,
+    ) -> "TransformClient":
+        """
+        Connect to a server on a Unix socket (if 'path' is given) or TCP
+        socket and request a transform.
+        """
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        writer.write(
+            _HEADER.pack(MAGIC, VERSION, wavelet, DIRECTIONS[direction], bit_depth)
+        )
+        return cls(reader, writer, frame_size)
+
+    async def send(self, samples: ArrayLike) -> None:
+        """Send samples to the server."""
+        samples = np.asarray(samples)
+        for start in range(0, len(samples), self.frame_size):
+            write_frame(self._writer, samples[start : start + self.frame_size])
+            await self._writer.drain()
+
+    async def end(self) -> None:
+        """Signal the end of the stream."""
+        write_end_of_stream(self._writer)
+        await self._writer.drain()
+
+    async def receive(self) -> Optional[np.ndarray]:
+        """
+        Receive the next frame of results, or None at the end of the stream.
+        """
+        return await read_frame(self._reader, sys.maxsize)
+
+    async def close(self) -> None:
+        """
+        Close the connection once any unsent data has been sent. (NB: This
+        will wait forever if the server is itself waiting for results to be
+        read, see :py:meth:`abort`.)
+        """
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    def abort(self) -> None:
+        """Close the connection immediately, discarding any unsent data."""
+        self._writer.transport.abort()
+
+
+async def transform_samples(
+    samples: ArrayLike,
+    wavelet: WaveletFilters,
+    direction: str = "analysis",
+    bit_depth: int = 16,
+    **kwargs: Any,
+) -> np.ndarray:
+    """
+    Transform a complete signal using a transform server. See
+    :py:meth:`TransformClient.connect` for arguments.
+    """
+    client = await TransformClient.connect(wavelet, direction, bit_depth, **kwargs)
+
+    async def produce() -> None:
+        await client.send(samples)
+        await client.end()
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        results = []
+        while True:
+            result = await client.receive()
+            if result is None:
+                break
+            results.append(result)
+        await producer
+    except BaseException:
+        producer.cancel()
+        client.abort()
+        raise
+
+    await client.close()
+    return np.concatenate(results) if results else np.zeros(0, SAMPLE_DTYPE)
+
+
+async def serve_forever(**kwargs: Any) -> None:
+    """Run a transform server until cancelled. See :py:func:`start_server`."""
+    server = await start_server(**kwargs)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Run a streaming wavelet transform server.")
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Address to listen on. Default: %(default)s.",
+    )
+    parser.add_argument(
+        "--port",
+        "-p",
+        type=int,
+        default=8765,
+        help="TCP port to listen on. Default: %(default)s.",
+    )
+    parser.add_argument(
+        "--unix",
+        "-u",
+        metavar="PATH",
+        help="Listen on a Unix socket at PATH instead of a TCP port.",
+    )
+    parser.add_argument(
+        "--max-frame-samples",
+        type=int,
+        default=DEFAULT_MAX_FRAME_SAMPLES,
+        help="Maximum number of samples per frame. Default: %(default)s.",
+    )
+    parser.add_argument(
+        "--write-buffer-limit",
+        type=int,
+        default=DEFAULT_WRITE_BUFFER_LIMIT,
+        help="""
+            Bytes of output buffered per connection before pausing.
+            Default: %(default)s.
+        """,
+    )
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(
+            serve_forever(
+                host=args.host if args.unix is None else None,
+                port=args.port if args.unix is None else None,
+                path=args.unix,
+                max_frame_samples=args.max_frame_samples,
+                write_buffer_limit=args.write_buffer_limit,
+            )
+        )
+    except KeyboardInterrupt:
+        pass